@@ -1,13 +1,36 @@
 import curses
+import gc
+import os
 import time
 import random
+import struct
 import sys
+import tracemalloc
+import argparse
+import csv
+import json
+import itertools
+from bisect import bisect_right, insort
+from collections import deque
 from curses import textpad
 from abc import ABC, abstractmethod
-from typing import List, Tuple, Dict, Optional
+from concurrent.futures import Future, ProcessPoolExecutor
+from array import array
+from typing import Callable, List, Tuple, Dict, Optional, Set
 from dataclasses import dataclass
+from types import MappingProxyType
 from enum import Enum
-from queue import PriorityQueue
+from pathfinding import (FlowField, GridGraph, PathWorkerPool, a_star,
+                         hierarchical_search, jump_point_search)
+
+try:
+    import numpy as np
+except ImportError:  # NumPy нужен только для векторного движка снарядов
+    np = None
+try:
+    import resource
+except ImportError:  # Модуля нет в Windows: пиковая память не замеряется
+    resource = None
 
 # Определение конфигураций уровней
 LEVEL_CONFIGS = {
@@ -26,10 +49,57 @@ LEVEL_CONFIGS = {
     # Добавьте дополнительные уровни по мере необходимости
 }
 
+# Противники каждого уровня (типы - ключи TANK_SPECS)
+LEVEL_TANKS = {
+    1: [{"type": "normal", "count": 3}],
+    2: [{"type": "normal", "count": 5 }],
+    3: [{"type": "normal", "count": 7}],
+    4: [{"type": "normal", "count": 10}],
+    5: [{"type": "normal", "count": 8}, 
+        {"type": "light", "count": 2}],
+    6: [{"type": "normal", "count": 8}, 
+        {"type": "light", "count": 2},
+        {"type": "medium", "count": 1}],
+    7: [{"type": "normal", "count": 8}, 
+        {"type": "light", "count": 2},
+        {"type": "medium", "count": 2}],
+    8: [{"type": "normal", "count": 8}, 
+        {"type": "light", "count": 2},
+        {"type": "medium", "count": 2},
+        {"type": "heavy", "count": 1}],
+    9: [{"type": "normal", "count": 8}, 
+        {"type": "light", "count": 2},
+        {"type": "medium", "count": 2},
+        {"type": "heavy", "count": 2}],
+    10: [{"type": "normal", "count": 10}, 
+        {"type": "light", "count": 2},
+        {"type": "medium", "count": 2},
+        {"type": "heavy", "count": 2}],
+    11: [{"type": "boss", "count": 1}]
+}
+
 # Константы игры
 GAME_TITLE = "Tank Battle"
 FPS = 60
 FRAME_TIME = 1.0 / FPS
+# Наибольшее число шагов симуляции за один кадр при отставании
+MAX_STEPS_PER_FRAME = 5
+# Клеток в секунду, которые проходит противник со скоростью 1.0
+ENEMY_MOVE_RATE = 4.0
+# Бюджет планировщика ИИ на пересчет путей за тик, мкс
+AI_BUDGET_US = 2000.0
+# Оценка стоимости пересчета: накладные расходы и одно раскрытие клетки
+# для каждого алгоритма, мкс (замерено на карте 300x150 с 60 противниками).
+# Стоимость считается по числу раскрытий, а не по часам, чтобы матчи
+# оставались воспроизводимыми
+AI_REPLAN_COST_US = 20.0
+AI_EXPANSION_COST_US = {"astar": 5.0, "jps": 10.0, "hpa": 2.5}
+# Предел числа свободных объектов в пуле
+POOL_LIMIT = 4096
+# Сколько последних кадров хранит профилировщик
+PROFILE_HISTORY = 600
+# Границы корзин гистограммы времени кадра, мс
+PROFILE_BUCKETS_MS = (1, 2, 4, 8, 16, 33, 66)
 
 # Перечисления для игровых состояний
 class GameState(Enum):
@@ -45,8 +115,18 @@ class Direction(Enum):
     LEFT = "left"
     RIGHT = "right "
 
+# Смещение на одну клетку для каждого направления
+DIRECTION_OFFSETS = {
+    Direction.UP: (0, -1),
+    Direction.DOWN: (0, 1),
+    Direction.LEFT: (-1, 0),
+    Direction.RIGHT: (1, 0)
+}
+
 # Базовый класс для всех игровых объектов
 class GameObject(ABC):
+    __slots__ = ("x", "y", "symbol", "color_pair")
+
     def __init__(self, x: int, y: int):
         self.x = x
         self.y = y
@@ -64,135 +144,442 @@ class GameObject(ABC):
     def get_position(self) -> Tuple[int, int]:
         return (self.x, self.y)
 
-# Класс для представления блоков на карте
-@dataclass
-class Block(GameObject):
-    METAL = "█"
-    BRICK = "▒"
-    BUSH = "♣"
-    AIR = " "
-
-    def __init__(self, x: int, y: int, block_type: str, durability: int = 4):
-        super().__init__(x, y)
-        self.block_type = block_type
-        self.durability = durability
-        self.symbol = self._get_symbol()
-        self.color_pair = self._get_color_pair()
-
-    def _get_symbol(self) -> str:
-        return {
-            "metal": Block.METAL,
-            "brick": Block.BRICK,
-            "bush": Block.BUSH,
-            "air": Block.AIR
-        }[self.block_type]
-
-    def _get_color_pair(self) -> int:
-        return {
-            "metal": 1,
-            "brick": 2,
-            "bush": 3,
-            "air": 0
-        }[self.block_type]
+# Цвета пар curses (номер пары -> цвет символа)
+PAIR_COLORS = {
+    1: curses.COLOR_WHITE,
+    2: curses.COLOR_RED,
+    3: curses.COLOR_GREEN,
+    4: curses.COLOR_YELLOW,
+    5: curses.COLOR_BLUE,
+    6: curses.COLOR_MAGENTA,
+    7: curses.COLOR_CYAN,
+    8: curses.COLOR_RED
+}
 
-    def update(self, game_map: 'GameMap') -> None:
-        if self.durability <= 0 and self.block_type == "brick":
-            self.block_type = "air"
-            self.symbol = Block.AIR
-            self.color_pair = 0
+def color_pair(pair: int) -> int:
+    """Атрибут цветовой пары; без инициализированного curses - в кодировке ncurses"""
+    try:
+        return curses.color_pair(pair)
+    except curses.error:
+        return pair << 8
+
+# Характеристики типа танка. Экземпляры общие для всех танков типа
+@dataclass(frozen=True)
+class TankSpec:
+    health: int
+    speed: float
+    reload_time: float
+    color_pair: int
+    damage: int
+
+# Реестр типов танков (только для чтения)
+TANK_SPECS = MappingProxyType({
+    "normal": TankSpec(health=1, speed=1.0, reload_time=1.0, color_pair=1, damage=1),
+    "light": TankSpec(health=1, speed=1.5, reload_time=0.5, color_pair=5, damage=1),
+    "medium": TankSpec(health=2, speed=1.0, reload_time=1.0, color_pair=6, damage=2),
+    "heavy": TankSpec(health=3, speed=0.5, reload_time=1.5, color_pair=7, damage=3),
+    "boss": TankSpec(health=20, speed=0.3, reload_time=2.0, color_pair=8, damage=5)
+})
+
+def validate_tank_specs() -> None:
+    """Проверка реестра и списков противников уровней при запуске"""
+    for name, spec in TANK_SPECS.items():
+        if spec.health <= 0 or spec.speed <= 0 or spec.reload_time <= 0:
+            raise ValueError(f"танк {name}: характеристики должны быть больше нуля")
+        if spec.damage < 0:
+            raise ValueError(f"танк {name}: отрицательный урон")
+        if spec.color_pair not in PAIR_COLORS:
+            raise ValueError(f"танк {name}: нет цветовой пары {spec.color_pair}")
+    for level, entries in LEVEL_TANKS.items():
+        for entry in entries:
+            if entry["type"] not in TANK_SPECS:
+                raise ValueError(f"уровень {level}: неизвестный тип танка "
+                                 f"{entry['type']!r}")
+            if entry["count"] <= 0:
+                raise ValueError(f"уровень {level}: число танков должно быть "
+                                 f"больше нуля")
+
+validate_tank_specs()
+
+# Символы танка по направлению
+TANK_SYMBOLS = {
+    Direction.UP: "▲",
+    Direction.DOWN: "▼",
+    Direction.LEFT: "◄",
+    Direction.RIGHT: "►"
+}
 
-    def render(self, screen) -> None:
-        if self.block_type != "air":
-            try:
-                screen.addch(self.y, self.x, self.symbol, 
-                           curses.color_pair(self.color_pair))
-            except curses.error:
-                pass
+# Компактная сетка местности: тип и прочность каждой клетки хранятся
+# в плоских байтовых массивах (индекс клетки - y * width + x)
+class Terrain:
+    AIR = 0
+    BRICK = 1
+    METAL = 2
+    BUSH = 3
+
+    TYPES = ("air", "brick", "metal", "bush")
+    CODES = {name: code for code, name in enumerate(TYPES)}
+    SYMBOLS = (" ", "▒", "█", "♣")
+    COLOR_PAIRS = (0, 2, 1, 3)
+    # По каким клеткам могут ездить танки
+    PASSABLE = (True, False, False, True)
+
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.types = bytearray(width * height)
+        self.durability = array('b', [0]) * (width * height)
+        # Клетки, получившие урон с прошлого обновления
+        self.dirty: Set[int] = set()
+        # Клетки, сменившие тип с прошлого обновления
+        self.changed: List[Tuple[int, int]] = []
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def get_code(self, x: int, y: int) -> int:
+        return self.types[y * self.width + x]
+
+    def set_block(self, x: int, y: int, block_type: str, durability: int = 4) -> None:
+        index = y * self.width + x
+        code = Terrain.CODES[block_type]
+        self.types[index] = code
+        self.durability[index] = durability
+
+    def change_block(self, x: int, y: int, block_type: str) -> None:
+        """Смена типа клетки во время игры с записью изменения"""
+        index = y * self.width + x
+        if self.types[index] != Terrain.CODES[block_type]:
+            self.set_block(x, y, block_type, self.durability[index])
+            self.changed.append((x, y))
+
+    def damage(self, x: int, y: int, amount: int) -> None:
+        """Уменьшение прочности клетки (не ниже нуля)"""
+        index = y * self.width + x
+        self.durability[index] = max(0, self.durability[index] - amount)
+        self.dirty.add(index)
+
+    def is_passable(self, x: int, y: int) -> bool:
+        return (0 <= x < self.width and 0 <= y < self.height and
+                Terrain.PASSABLE[self.types[y * self.width + x]])
+
+    def collect_changes(self) -> List[Tuple[int, int]]:
+        """Разрушение поврежденных кирпичей и выдача всех измененных клеток"""
+        for index in self.dirty:
+            if self.types[index] == Terrain.BRICK and self.durability[index] <= 0:
+                self.change_block(index % self.width, index // self.width, "air")
+        self.dirty.clear()
+        changed, self.changed = self.changed, []
+        return changed
+
+# Индекс клеток, задерживающих снаряды: отсортированные координаты для
+# каждой строки и каждого столбца. Проверка линии огня - один bisect
+class BlockerIndex:
+    def __init__(self, width: int, height: int):
+        self.rows: List[List[int]] = [[] for _ in range(height)]
+        self.columns: List[List[int]] = [[] for _ in range(width)]
+
+    def load(self, terrain: Terrain) -> None:
+        """Построение индекса по всей карте"""
+        width = terrain.width
+        self.rows = [[] for _ in range(terrain.height)]
+        self.columns = [[] for _ in range(width)]
+        # Обход по порядку клеток сразу дает отсортированные списки
+        for index, code in enumerate(terrain.types):
+            if code != Terrain.AIR:
+                x, y = index % width, index // width
+                self.rows[y].append(x)
+                self.columns[x].append(y)
+
+    def update_cells(self, terrain: Terrain, cells: List[Tuple[int, int]]) -> None:
+        """Учет клеток, сменивших тип"""
+        for x, y in cells:
+            row, column = self.rows[y], self.columns[x]
+            i = bisect_right(row, x)
+            present = i > 0 and row[i - 1] == x
+            if terrain.get_code(x, y) != Terrain.AIR:
+                if not present:
+                    row.insert(i, x)
+                    insort(column, y)
+            elif present:
+                del row[i - 1]
+                del column[bisect_right(column, y) - 1]
+
+    def is_clear(self, x0: int, y0: int, x1: int, y1: int) -> bool:
+        """Нет ли преград строго между двумя клетками одной строки или столбца"""
+        if y0 == y1:
+            line, low, high = self.rows[y0], min(x0, x1), max(x0, x1)
+        else:
+            line, low, high = self.columns[x0], min(y0, y1), max(y0, y1)
+        i = bisect_right(line, low)
+        return i == len(line) or line[i] >= high
 
 # Класс для снарядов
 class Projectile(GameObject):
+    __slots__ = ("direction", "damage", "owner_uid", "speed", "launched")
+
     def __init__(self, x: int, y: int, direction: Direction, damage: int, 
-                 owner: 'Tank'):
+                 owner: Optional['Tank']):
+        self.reset(x, y, direction, damage, owner)
+
+    def reset(self, x: int, y: int, direction: Direction, damage: int,
+              owner: Optional['Tank']) -> None:
+        """Повторная инициализация снаряда, взятого из пула"""
         super().__init__(x, y)
         self.direction = direction
         self.damage = damage
-        self.owner = owner
+        # Владелец хранится номером: танк из пула может вернуться под
+        # новым номером, а снаряды прежнего владельца должны его ранить.
+        # Снаряд без владельца получает номер 0 (номера танков начинаются с 1)
+        self.owner_uid = owner.uid if owner is not None else 0
         self.symbol = "•"
         self.color_pair = 4
         self.speed = 2
+        self.launched = False
+
+    def update(self, game_map: 'GameMap') -> bool:
+        """Движение снаряда, True - снаряд израсходован
+
+        Снаряд проходит каждую клетку своего пути, поэтому при любой
+        скорости не пролетает сквозь кирпич или танк.
+        """
+        if not self.launched:
+            # Клетка появления тоже проверяется
+            self.launched = True
+            if self._hit_cell(game_map):
+                return True
+
+        dx, dy = DIRECTION_OFFSETS[self.direction]
+        for _ in range(self.speed):
+            self.x += dx
+            self.y += dy
+            if self._hit_cell(game_map):
+                return True
+        return False
 
-    def update(self, game_map: 'GameMap') -> None:
-        if self.direction == Direction.UP:
-            self.y -= self.speed
-        elif self.direction == Direction.DOWN:
-            self.y += self.speed
-        elif self.direction == Direction.LEFT:
-            self.x -= self.speed
-        elif self.direction == Direction.RIGHT:
-            self.x += self.speed
-
-        # Проверка столкновений
-        block = game_map.get_block(self.x, self.y)
-        if block and block.block_type != "air":
-            if block.block_type == "brick":
-                block.durability -= self.damage
+    def _hit_cell(self, game_map: 'GameMap') -> bool:
+        # Проверка столкновений в текущей клетке: сначала блок, затем танки
+        terrain = game_map.terrain
+        if not terrain.in_bounds(self.x, self.y):
+            # Снаряд вылетел за пределы карты
             return True
-        return False
+        code = terrain.get_code(self.x, self.y)
+        if code != Terrain.AIR:
+            if code == Terrain.BRICK:
+                terrain.damage(self.x, self.y, self.damage)
+            return True
+        return game_map.check_projectile_hit(self)
 
     def render(self, screen) -> None:
         try:
             screen.addch(self.y, self.x, self.symbol, 
-                        curses.color_pair(self.color_pair))
+                        color_pair(self.color_pair))
         except curses.error:
             pass
 
+# Пул объектов: освобожденные объекты переиспользуются через reset(),
+# поэтому в установившейся игре новые объекты не создаются
+class ObjectPool:
+    def __init__(self, factory: Callable, limit: int = POOL_LIMIT):
+        self.factory = factory
+        # Больше limit свободных объектов не хранится: снаряды, созданные
+        # в обход пула, не должны копиться в нем бесконечно
+        self.limit = limit
+        self.free: List = []
+        # Сколько объектов создано и сколько раз выдан освобожденный
+        self.created = 0
+        self.reused = 0
+
+    def __len__(self) -> int:
+        return len(self.free)
+
+    def acquire(self, *args):
+        """Объект из списка свободных или новый, если список пуст"""
+        if self.free:
+            obj = self.free.pop()
+            obj.reset(*args)
+            self.reused += 1
+            return obj
+        self.created += 1
+        return self.factory(*args)
+
+    def release(self, obj) -> None:
+        if len(self.free) < self.limit:
+            self.free.append(obj)
+
+# Векторный движок снарядов: координаты, направления, урон и владельцы
+# хранятся в параллельных массивах NumPy и обновляются все сразу
+class ProjectileStore:
+    AIR = 0
+    BRICK = 1
+    SOLID = 2
+
+    def __init__(self, width: int, height: int, capacity: int = 256):
+        if np is None:
+            raise RuntimeError("Для векторного движка снарядов нужен NumPy")
+        self.width = width
+        self.height = height
+        self.count = 0
+        self.x = np.zeros(capacity, dtype=np.int32)
+        self.y = np.zeros(capacity, dtype=np.int32)
+        self.dx = np.zeros(capacity, dtype=np.int32)
+        self.dy = np.zeros(capacity, dtype=np.int32)
+        self.speed = np.zeros(capacity, dtype=np.int32)
+        self.damage = np.zeros(capacity, dtype=np.int32)
+        self.owner = np.zeros(capacity, dtype=np.int32)
+        self.launched = np.zeros(capacity, dtype=bool)
+        # Тип клетки для снаряда и маска клеток с танками, игроком и флагом
+        self.terrain = np.zeros((height, width), dtype=np.uint8)
+        self.occupied = np.zeros((height, width), dtype=bool)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _columns(self) -> List:
+        return [self.x, self.y, self.dx, self.dy, self.speed, self.damage,
+                self.owner, self.launched]
+
+    def _grow(self) -> None:
+        capacity = len(self.x) * 2
+        for name in ("x", "y", "dx", "dy", "speed", "damage", "owner",
+                     "launched"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:self.count] = column[:self.count]
+            setattr(self, name, grown)
+
+    def load_terrain(self, game_map: 'GameMap') -> None:
+        # Коды местности: воздух и кирпич совпадают, остальное - сплошной блок
+        codes = np.frombuffer(game_map.terrain.types, dtype=np.uint8)
+        self.terrain[:] = np.minimum(codes, self.SOLID).reshape(self.height,
+                                                                self.width)
+
+    def update_cells(self, game_map: 'GameMap', cells: List[Tuple[int, int]]) -> None:
+        for x, y in cells:
+            self.terrain[y, x] = min(game_map.terrain.get_code(x, y), self.SOLID)
+
+    def add(self, projectile: Projectile) -> None:
+        """Перенос снаряда в массивы хранилища"""
+        if self.count == len(self.x):
+            self._grow()
+        i = self.count
+        dx, dy = DIRECTION_OFFSETS[projectile.direction]
+        self.x[i] = projectile.x
+        self.y[i] = projectile.y
+        self.dx[i] = dx
+        self.dy[i] = dy
+        self.speed[i] = projectile.speed
+        self.damage[i] = projectile.damage
+        self.owner[i] = projectile.owner_uid
+        self.launched[i] = False
+        self.count += 1
+
+    def step(self, game_map: 'GameMap') -> None:
+        """Движение всех снарядов одним векторным шагом на клетку"""
+        n = self.count
+        if n == 0:
+            return
+
+        # Маска клеток, где снаряд может в кого-то попасть
+        marked = [(tank.x, tank.y) for tank in game_map.tanks]
+        if game_map.player:
+            marked.append((game_map.player.x, game_map.player.y))
+        marked.append(game_map.flag_position)
+        for x, y in marked:
+            if 0 <= x < self.width and 0 <= y < self.height:
+                self.occupied[y, x] = True
+
+        alive = np.ones(n, dtype=bool)
+        fresh = np.flatnonzero(~self.launched[:n])
+        self.launched[:n] = True
+        if fresh.size:
+            alive[fresh[self._collide(game_map, fresh)]] = False
+
+        speed = self.speed[:n]
+        for step in range(int(speed.max())):
+            moving = np.flatnonzero(alive & (speed > step))
+            if not moving.size:
+                break
+            self.x[moving] += self.dx[moving]
+            self.y[moving] += self.dy[moving]
+            alive[moving[self._collide(game_map, moving)]] = False
+
+        for x, y in marked:
+            if 0 <= x < self.width and 0 <= y < self.height:
+                self.occupied[y, x] = False
+
+        # Удаление израсходованных снарядов сразу для всех массивов
+        keep = np.flatnonzero(alive)
+        if keep.size != n:
+            for column in self._columns():
+                column[:keep.size] = column[keep]
+            self.count = keep.size
+
+    def _collide(self, game_map: 'GameMap', indices) -> 'np.ndarray':
+        """Проверка клеток снарядов: граница карты, блоки, затем танки"""
+        xs = self.x[indices]
+        ys = self.y[indices]
+        hit = (xs < 0) | (xs >= self.width) | (ys < 0) | (ys >= self.height)
+        inside = np.flatnonzero(~hit)
+        if not inside.size:
+            return hit
+
+        cells = self.terrain[ys[inside], xs[inside]]
+        solid = cells != self.AIR
+        hit[inside[solid]] = True
+        for k in inside[cells == self.BRICK].tolist():
+            game_map.terrain.damage(int(xs[k]), int(ys[k]),
+                                    int(self.damage[indices[k]]))
+
+        # Попадания в танки разбираются поштучно, только в отмеченных клетках
+        rest = inside[~solid]
+        candidates = rest[self.occupied[ys[rest], xs[rest]]]
+        for k in candidates.tolist():
+            i = indices[k]
+            if game_map.apply_hit(int(xs[k]), int(ys[k]), int(self.damage[i]),
+                                  int(self.owner[i])):
+                hit[k] = True
+        return hit
+
+    def render(self, screen, camera: Optional['Camera'] = None) -> None:
+        pair = color_pair(4)
+        xs = self.x[:self.count]
+        ys = self.y[:self.count]
+        if camera is not None:
+            # Только снаряды внутри камеры
+            visible = ((xs >= camera.x) & (xs < camera.x + camera.width) &
+                       (ys >= camera.y) & (ys < camera.y + camera.height))
+            xs = xs[visible]
+            ys = ys[visible]
+        for x, y in zip(xs.tolist(), ys.tolist()):
+            try:
+                screen.addch(y, x, "•", pair)
+            except curses.error:
+                pass
+
 # Базовый класс для всех типов танков
 class Tank(GameObject):
+    __slots__ = ("uid", "tank_type", "spec", "direction", "health", "speed",
+                 "reload_time", "last_shot_time")
+
+    _uids = itertools.count(1)
+
     def __init__(self, x: int, y: int, tank_type: str):
         super().__init__(x, y)
+        self.uid = next(Tank._uids)
         self.tank_type = tank_type
+        self.spec = TANK_SPECS[tank_type]
         self.direction = Direction.UP
-        self.health = self._get_initial_health()
-        self.speed = self._get_speed()
-        self.reload_time = self._get_reload_time()
+        self.health = self.spec.health
+        self.speed = self.spec.speed
+        self.reload_time = self.spec.reload_time
         self.last_shot_time = 0
         self.symbol = "▲"
-        self.color_pair = self._get_color_pair()
-        self.projectiles: List[Projectile] = []
-
-    def _get_initial_health(self) -> int:
-        return {
-            "light": 1,
-            "medium": 2,
-            "heavy": 3,
-            "boss": 20
-        }[self.tank_type]
-
-    def _get_speed(self) -> float:
-        return {
-            "light": 1.5,
-            "medium": 1.0,
-            "heavy": 0.5,
-            "boss": 0.3
-        }[self.tank_type]
-
-    def _get_reload_time(self) -> float:
-        return {
-            "light": 0.5,
-            "medium": 1.0,
-            "heavy": 1.5,
-            "boss": 2.0
-        }[self.tank_type]
+        self.color_pair = self.spec.color_pair
 
-    def _get_color_pair(self ) -> int:
-        return {
-            "light": 5,
-            "medium": 6,
-            "heavy": 7,
-            "boss": 8
-        }[self.tank_type]
-
-    def shoot(self, current_time: float) -> Optional[Projectile]:
+    def shoot(self, current_time: float,
+              pool: Optional['ObjectPool'] = None) -> Optional[Projectile]:
+        """Выстрел, если оружие перезаряжено; снаряд берется из pool"""
         if current_time - self.last_shot_time >= self.reload_time:
             self.last_shot_time = current_time
             
@@ -209,18 +596,13 @@ class Tank(GameObject):
             elif self.direction == Direction.RIGHT:
                 projectile_x += 1
                 
+            if pool is not None:
+                return pool.acquire(projectile_x, projectile_y, self.direction,
+                                    self.spec.damage, self)
             return Projectile(projectile_x, projectile_y, self.direction, 
-                            self._get_damage(), self)
+                            self.spec.damage, self)
         return None
 
-    def _get_damage(self) -> int:
-        return {
-            "light": 1,
-            "medium": 2,
-            "heavy": 3,
-            "boss": 5
-        }[self.tank_type]
-
     def update(self, game_map: 'GameMap') -> None:
         # Обновление состояния танка
         pass
@@ -228,26 +610,21 @@ class Tank(GameObject):
     def render(self, screen) -> None:
         try:
             # Отрисовка танка с учетом направления
-            symbol = {
-                Direction.UP: "▲",
-                Direction.DOWN: "▼",
-                Direction.LEFT: "◄",
-                Direction.RIGHT: "►"
-            }[self.direction]
-            
-            screen.addch(self.y, self.x, symbol, 
-                        curses.color_pair(self.color_pair))
+            screen.addch(self.y, self.x, TANK_SYMBOLS[self.direction], 
+                        color_pair(self.color_pair))
             
             # Отрисовка здоровья для босса
             if self.tank_type == "boss":
                 health_bar = f"HP: {'█' * self.health}"
                 screen.addstr(self.y - 1, self.x - len(health_bar) // 2, 
-                            health_bar, curses.color_pair(self.color_pair))
+                            health_bar, color_pair(self.color_pair))
         except curses.error:
             pass
 
 # Класс игрока
 class PlayerTank(Tank):
+    __slots__ = ("lives", "score", "current_weapon", "weapons")
+
     def __init__(self, x: int, y: int):
         super().__init__(x, y, "medium")
         self.lives = 3
@@ -269,21 +646,23 @@ class PlayerTank(Tank):
         # Проверка столкновений и обновление состояния
         new_x = self.x
         new_y = self.y
+        # Координаты на сетке целочисленные, поэтому шаг не меньше клетки
+        step = max(1, int(self.speed))
         
         keys = game_map.get_pressed_keys()
         
         if keys.get(curses.KEY_UP):
             self.direction = Direction.UP
-            new_y -= self.speed
+            new_y -= step
         elif keys.get(curses.KEY_DOWN):
             self.direction = Direction.DOWN
-            new_y += self.speed
+            new_y += step
         elif keys.get(curses.KEY_LEFT):
             self.direction = Direction.LEFT
-            new_x -= self.speed
+            new_x -= step
         elif keys.get(curses.KEY_RIGHT):
             self.direction = Direction.RIGHT
-            new_x += self.speed
+            new_x += step
 
         # Проверка возможности движения
         if game_map.can_move_to(new_x, new_y):
@@ -292,23 +671,47 @@ class PlayerTank(Tank):
 
 # Класс противника
 class EnemyTank(Tank):
-    def __init__(self, x: int, y: int, tank_type: str):
+    __slots__ = ("target", "path", "last_path_update", "path_update_interval",
+                 "move_budget", "pending_path", "pathfinder")
+
+    def __init__(self, x: int, y: int, tank_type: str, 
+                 pathfinder: str = "flow"):
+        self.reset(x, y, tank_type, pathfinder)
+
+    def reset(self, x: int, y: int, tank_type: str,
+              pathfinder: str = "flow") -> None:
+        """Повторная инициализация танка, взятого из пула (с новым номером)"""
         super().__init__(x, y, tank_type)
         self.target = None
         self.path = []
         self.last_path_update = 0
         self.path_update_interval = 1.0
+        # Накопленный запас хода: танк делает шаг, когда он достигает клетки
+        self.move_budget = 0.0
+        # Незавершенный фоновый поиск пути (при включенном пуле исполнителей)
+        self.pending_path: Optional[Future] = None
+        # "flow" - общее поле потока карты, "astar" - собственный A*,
+        # "jps" - Jump Point Search, "hpa" - иерархический поиск по кластерам
+        self.pathfinder = pathfinder
 
     def update(self, game_map: 'GameMap') -> None:
-        current_time = time.time()
-        
-        # Обновление пути к цели
-        if current_time - self.last_path_update >= self.path_update_interval:
-            self.last_path_update = current_time
-            self.update_path(game_map)
+        # Скорость движения задается в клетках в секунду, а не в тиках
+        self.move_budget = min(1.0, self.move_budget +
+                               self.speed * ENEMY_MOVE_RATE * game_map.dt)
+
+        if self.pathfinder == "flow":
+            self._follow_flow_field(game_map)
+            return
+
+        # Результат фонового поиска применяется, как только он готов;
+        # до этого танк едет по старому пути. Сам пересчет пути запускает
+        # планировщик ИИ карты
+        if self.pending_path is not None and self.pending_path.done():
+            self._apply_path(self.pending_path.result())
+            self.pending_path = None
 
         # Движение по пути
-        if self.path:
+        if self.path and self.move_budget >= 1.0:
             next_x, next_y = self.path[0]
             
             # Определение направления движения
@@ -322,76 +725,319 @@ class EnemyTank(Tank):
                 self.direction = Direction.UP
 
             # Проверка возможности движения
-            if game_map.can_move_to(next_x, next_y):
-                self.x = next_x
-                self.y = next_y
+            if (next_x, next_y) == (self.x, self.y):
+                self.path.pop(0)
+            elif (game_map.can_move_to(next_x, next_y) and
+                  not game_map.is_occupied(next_x, next_y)):
+                game_map.move_tank(self, next_x, next_y)
                 self.path.pop(0)
+                self.move_budget -= 1.0
+
+    def _follow_flow_field(self, game_map: 'GameMap') -> None:
+        # Следующий шаг берется из общего поля потока за O(1)
+        self.target = game_map.get_enemy_target()
+        step = game_map.get_flow_field(self.target).next_step(self.x, self.y)
+        if not step or self.move_budget < 1.0:
+            return
+
+        next_x, next_y = step
+        if next_x > self.x:
+            self.direction = Direction.RIGHT
+        elif next_x < self.x:
+            self.direction = Direction.LEFT
+        elif next_y > self.y:
+            self.direction = Direction.DOWN
+        elif next_y < self.y:
+            self.direction = Direction.UP
+
+        if not game_map.is_occupied(next_x, next_y):
+            game_map.move_tank(self, next_x, next_y)
+            self.move_budget -= 1.0
+
+    def needs_replan(self, current_time: float) -> bool:
+        """Пора ли пересчитать путь (для поля потока - никогда)"""
+        return (self.pathfinder != "flow" and
+                current_time - self.last_path_update >= self.path_update_interval)
 
     def update_path(self, game_map: 'GameMap') -> None:
         # Поиск пути к флагу или игроку
-        if game_map.player:
-            self.target = game_map.player.get_position()
-        else:
-            self.target = game_map.flag_position
+        self.target = game_map.get_enemy_target()
 
-        if self.target:
+        if not self.target:
+            return
+        if game_map.path_workers is None:
             self.path = self.find_path(game_map, self.target)
+        elif self.pending_path is None:
+            self.pending_path = game_map.path_workers.submit(
+                self.pathfinder, (self.x, self.y), self.target)
+
+    def _apply_path(self, path: List[Tuple[int, int]]) -> None:
+        # Путь искался из прежней позиции: продолжаем его с текущей клетки.
+        # Если танк уже сошел с него, оставляем старый путь до следующего поиска
+        position = (self.x, self.y)
+        if position in path:
+            self.path = path[path.index(position):]
+        elif not path:
+            self.path = []
 
     def find_path(self, game_map: 'GameMap', target: Tuple[int, int]) -> List[Tuple[int, int]]:
-        # Реализация алгоритма поиска пути (A*)
+        # Поиск пути выбранным алгоритмом (A*, Jump Point Search или HPA*)
+        if self.pathfinder == "jps":
+            return self._jump_point_search(game_map, (self.x, self.y), target)
+        if self.pathfinder == "hpa":
+            return self._hierarchical_search(game_map, (self.x, self.y), target)
         return self._a_star(game_map, (self.x, self.y), target)
 
     def _a_star(self, game_map: 'GameMap', start: Tuple[int, int], 
                 goal: Tuple[int, int]) -> List[Tuple[int, int]]:
-        # Реализация A* алгоритма
-        frontier = PriorityQueue()
-        frontier.put(start, 0)
-        came_from = {start: None}
-        cost_so_far = {start: 0}
-
-        while not frontier.empty():
-            current = frontier.get()
-
-            if current == goal:
-                break
-
-            for next_pos in game_map.get_neighbors(current[0], current[1]):
-                new_cost = cost_so_far[current] + 1
-
-                if next_pos not in cost_so_far or new_cost < cost_so_far[next_pos]:
-                    cost_so_far[next_pos] = new_cost
-                    priority = new_cost + self._heuristic(next_pos, goal)
-                    frontier.put(next_pos, priority)
-                    came_from[next_pos] = current
-
-        return self._reconstruct_path(came_from, start, goal)
+        # Реализация A* алгоритма на общей сетке карты
+        return a_star(game_map.grid, start, goal)
+
+    def _jump_point_search(self, game_map: 'GameMap', start: Tuple[int, int],
+                           goal: Tuple[int, int]) -> List[Tuple[int, int]]:
+        # Путь той же длины, что и у A*, с меньшим числом раскрытий
+        return jump_point_search(game_map.grid, start, goal)
+
+    def _hierarchical_search(self, game_map: 'GameMap', start: Tuple[int, int],
+                             goal: Tuple[int, int]) -> List[Tuple[int, int]]:
+        # Дальние маршруты по графу кластеров для больших карт
+        return hierarchical_search(game_map.grid, start, goal)
+
+# Камера: прямоугольник мира размером с видимую область экрана,
+# следующий за игроком
+class Camera:
+    def __init__(self, width: int, height: int, x: int = 0, y: int = 0):
+        self.width = width
+        self.height = height
+        self.x = x
+        self.y = y
 
-    def _heuristic(self, pos1: Tuple[int, int], pos2: Tuple[int, int]) -> float:
-        # Манхэттенское расстояние
-        return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
+    def follow(self, x: int, y: int, world_width: int, world_height: int) -> None:
+        """Центрирование на точке без выхода за границы мира"""
+        self.x = max(0, min(x - self.width // 2, world_width - self.width))
+        self.y = max(0, min(y - self.height // 2, world_height - self.height))
 
-    def _reconstruct_path(self, came_from: Dict, start: Tuple[int, int], 
-                         goal: Tuple[int, int]) -> List[Tuple[int, int]]:
-        current = goal
-        path = []
+    def contains(self, x: int, y: int) -> bool:
+        return (self.x <= x < self.x + self.width and
+                self.y <= y < self.y + self.height)
 
-        while current != start:
-            path.append(current)
-            current = came_from[current]
+# Поверхность для рисования в мировых координатах: переводит их в экранные
+# и отбрасывает все, что не попало в камеру
+class CameraSurface:
+    def __init__(self, screen, camera: Camera, top: int = 0, left: int = 0):
+        self.screen = screen
+        self.camera = camera
+        self.top = top
+        self.left = left
+
+    def addch(self, y: int, x: int, ch: str, attr: int = 0) -> None:
+        camera = self.camera
+        if not camera.contains(x, y):
+            raise curses.error("addch() returned ERR")
+        self.screen.addch(y - camera.y + self.top, x - camera.x + self.left, ch, attr)
+
+    def addstr(self, y: int, x: int, text: str, attr: int = 0) -> None:
+        camera = self.camera
+        # Обрезка строки по краям камеры
+        start = max(0, camera.x - x)
+        end = min(len(text), camera.x + camera.width - x)
+        if not (camera.y <= y < camera.y + camera.height) or start >= end:
+            raise curses.error("addstr() returned ERR")
+        self.screen.addstr(y - camera.y + self.top, x + start - camera.x + self.left,
+                           text[start:end], attr)
+
+# Игровые часы, по которым живут все объекты карты. Три режима:
+# реальное время, ускоренное (scale раз быстрее реального) и виртуальное,
+# которое двигается только вызовами advance/advance_to
+class SimClock:
+    def __init__(self, scale: float = 1.0,
+                 source: Optional[Callable[[], float]] = time.perf_counter):
+        self.scale = scale
+        # source = None - виртуальное время
+        self.source = source
+        self.origin = source() if source is not None else 0.0
+        self.time = 0.0
+        self.paused_at: Optional[float] = None
+
+    @classmethod
+    def real(cls) -> 'SimClock':
+        return cls()
+
+    @classmethod
+    def scaled(cls, scale: float) -> 'SimClock':
+        return cls(scale)
+
+    @classmethod
+    def virtual(cls) -> 'SimClock':
+        return cls(source=None)
+
+    @property
+    def is_virtual(self) -> bool:
+        return self.source is None
+
+    def now(self) -> float:
+        """Текущее игровое время в секундах"""
+        if self.source is None:
+            return self.time
+        if self.paused_at is not None:
+            return self.paused_at
+        return (self.source() - self.origin) * self.scale
+
+    def advance(self, dt: float) -> None:
+        """Сдвиг виртуального времени на dt секунд"""
+        self.advance_to(self.time + dt)
+
+    def advance_to(self, time_point: float) -> None:
+        if self.source is not None:
+            raise ValueError("часы реального времени нельзя переводить")
+        self.time = max(self.time, time_point)
+
+    def pause(self) -> None:
+        if self.source is not None and self.paused_at is None:
+            self.paused_at = self.now()
+
+    def resume(self) -> None:
+        if self.paused_at is not None:
+            # Время паузы не засчитывается
+            self.origin = self.source() - self.paused_at / self.scale
+            self.paused_at = None
+
+# Планировщик ИИ: пересчитывает пути противников по очереди в пределах
+# бюджета на тик. Сначала танки без пути или с испорченным путем, затем
+# ближайшие к цели, при равенстве - дольше всех ждавшие. Что не уместилось
+# в бюджет, остается в очереди на следующий тик
+class AIScheduler:
+    def __init__(self, budget_us: float = AI_BUDGET_US):
+        self.budget_us = budget_us
+        self.replans = 0
+        # Сколько танков не уместилось в бюджет на последнем тике
+        self.deferred = 0
+        self.spent_us = 0.0
+
+    def _priority(self, tank: 'EnemyTank', target: Tuple[int, int]) -> Tuple:
+        invalidated = not tank.path or tank.last_path_update == float('-inf')
+        distance = abs(tank.x - target[0]) + abs(tank.y - target[1])
+        return (not invalidated, distance, tank.last_path_update)
+
+    def run(self, game_map: 'GameMap', current_time: float) -> None:
+        due = [tank for tank in game_map.tanks
+               if isinstance(tank, EnemyTank) and tank.needs_replan(current_time)]
+        self.spent_us = 0.0
+        self.deferred = 0
+        if not due:
+            return
+        target = game_map.get_enemy_target()
+        due.sort(key=lambda tank: self._priority(tank, target))
+
+        grid = game_map.grid
+        for done, tank in enumerate(due):
+            # Хотя бы один пересчет за тик, чтобы очередь всегда двигалась
+            if done and self.spent_us >= self.budget_us:
+                self.deferred = len(due) - done
+                break
+            expansions = grid.expansions
+            tank.last_path_update = current_time
+            tank.update_path(game_map)
+            self.spent_us += (AI_REPLAN_COST_US +
+                              AI_EXPANSION_COST_US[tank.pathfinder] *
+                              (grid.expansions - expansions))
+            self.replans += 1
+
+# Профилировщик кадра: время каждой фазы обновления и отрисовки.
+# Пока он не подключен к карте (GameMap.profiler = None), фазы не замеряются
+class FrameProfiler:
+    def __init__(self, history: int = PROFILE_HISTORY):
+        self.phases: Dict[str, float] = {}
+        self.last_phases: Dict[str, float] = {}
+        self.frame_time = 0.0
+        # Последние кадры: (время кадра, время фаз), в секундах
+        self.history = deque(maxlen=history)
+        self.frame_start = time.perf_counter()
+        self.mark_time = self.frame_start
+
+    def reset_frame(self) -> None:
+        """Начало нового кадра без учета времени до него (меню, пауза)"""
+        self.frame_start = time.perf_counter()
+        self.mark_time = self.frame_start
+        self.phases = {}
+
+    def checkpoint(self) -> None:
+        """Начало замеряемого участка"""
+        self.mark_time = time.perf_counter()
+
+    def mark(self, phase: str) -> None:
+        """Конец фазы: время с последней отметки добавляется к ней"""
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0.0) + now - self.mark_time
+        self.mark_time = now
+
+    def end_frame(self) -> None:
+        now = time.perf_counter()
+        self.frame_time = now - self.frame_start
+        self.frame_start = now
+        self.last_phases = self.phases
+        self.history.append((self.frame_time, self.phases))
+        self.phases = {}
+
+    def hud_line(self, game_map: 'GameMap') -> str:
+        """Строка для HUD: время кадра, фаз и число объектов"""
+        busy = sum(self.last_phases.values())
+        phases = " ".join(f"{phase} {seconds * 1000:.2f}"
+                          for phase, seconds in self.last_phases.items())
+        return (f"кадр {self.frame_time * 1000:.1f} мс (работа {busy * 1000:.2f}) "
+                f"| {phases} | танков {len(game_map.tanks)} "
+                f"снарядов {game_map.projectile_count()}")
+
+    def summary(self) -> Dict:
+        """Процентили фаз и гистограмма времени кадра по истории"""
+        def percentiles(values: List[float]) -> Dict[str, float]:
+            ordered = sorted(values)
+            pick = lambda fraction: ordered[min(len(ordered) - 1,
+                                                int(len(ordered) * fraction))]
+            return {"p50_ms": pick(0.5) * 1000, "p90_ms": pick(0.9) * 1000,
+                    "p99_ms": pick(0.99) * 1000, "max_ms": ordered[-1] * 1000}
+
+        frames = [frame for frame, _ in self.history]
+        names = sorted({phase for _, phases in self.history for phase in phases})
+        buckets = [0] * (len(PROFILE_BUCKETS_MS) + 1)
+        for frame in frames:
+            index = 0
+            while (index < len(PROFILE_BUCKETS_MS) and
+                   frame * 1000 >= PROFILE_BUCKETS_MS[index]):
+                index += 1
+            buckets[index] += 1
+        labels = ([f"<{PROFILE_BUCKETS_MS[0]}"] +
+                  [f"{low}-{high}" for low, high in
+                   zip(PROFILE_BUCKETS_MS, PROFILE_BUCKETS_MS[1:])] +
+                  [f">={PROFILE_BUCKETS_MS[-1]}"])
+        return {
+            "frames": len(frames),
+            "frame": percentiles(frames) if frames else {},
+            "phases": {name: percentiles([phases.get(name, 0.0)
+                                          for _, phases in self.history])
+                       for name in names},
+            "histogram_ms": dict(zip(labels, buckets))
+        }
 
-        path.append(start)
-        path.reverse()
-        return path
+    def dump(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.summary(), file, indent=2)
 
 # Класс для управления картой и игровым миром
 class GameMap:
-    def __init__(self, width: int, height: int, level: int):
+    def __init__(self, width: int, height: int, level: int,
+                 clock: Optional[SimClock] = None, seed: Optional[int] = None,
+                 ai_budget_us: float = AI_BUDGET_US):
         self.width = width
         self.height = height
         self.level = level
-        self.blocks: List[List[Block]] = []
+        self.terrain = Terrain(width, height)
+        self.blockers = BlockerIndex(width, height)
         self.tanks: List[Tank] = []
         self.projectiles: List[Projectile] = []
+        # Пулы снарядов и танков противника
+        self.projectile_pool = ObjectPool(Projectile)
+        self.tank_pool = ObjectPool(EnemyTank)
         self.player: Optional[PlayerTank] = None
         self.flag_position: Tuple[int, int] = (0, 0)
         self.spawn_points: List[Tuple[int, int]] = []
@@ -399,21 +1045,52 @@ class GameMap:
         self.spawn_interval = 10  # секунды между появлением танков
         self.killed_tanks = 0
         self.deaths = 0
-        self.start_time = time.time()
+        # Единые часы карты (по умолчанию виртуальные)
+        self.clock = clock or SimClock.virtual()
+        self.start_time = self.clock.now()
+        # Собственный генератор случайных чисел матча: одинаковое зерно
+        # и одинаковый ввод дают одинаковую игру
+        self.seed = seed if seed is not None else random.randrange(2 ** 32)
+        self.rng = random.Random(self.seed)
         self.pressed_keys = {}
+        self.game_state = GameState.PLAYING
+        self.grid = GridGraph(width, height)
+        # Танки противника по клеткам (ключ - y * width + x). Обновляется
+        # при появлении, движении и гибели танка через add_tank/move_tank
+        self.tank_index: Dict[int, List[Tank]] = {}
+        # Снаряды по клеткам для отсечения камерой; перестраивается
+        # за тот же проход, что двигает снаряды
+        self.projectile_index: Dict[int, List[Projectile]] = {}
+        self.collision_result: Optional[GameState] = None
+        self.tank_killed = False
+        # Векторное хранилище снарядов (None - обычные объекты Projectile)
+        self.projectile_store: Optional[ProjectileStore] = None
+        # Пул процессов для поиска пути (None - поиск в главном цикле)
+        self.path_workers: Optional[PathWorkerPool] = None
+        self.ai_scheduler = AIScheduler(ai_budget_us)
+        # Профилировщик фаз (None - выключен)
+        self.profiler: Optional[FrameProfiler] = None
+        self.enemy_pathfinder = "flow"
+        self.flow_field = FlowField(self.grid)
+        # Время предыдущего обновления и длительность текущего шага
+        self.last_update_time: Optional[float] = None
+        self.dt = 0.0
+        # Подписчики на событие изменения местности: получают список клеток
+        self.terrain_listeners: List[Callable[[List[Tuple[int, int]]], None]] = []
 
     def initialize_level(self) -> None:
         """Инициализация уровня на основе его номера"""
-        self.blocks = [[Block(x, y, "air") for x in range(self.width)] 
-                      for y in range(self.height)]
+        self.terrain = Terrain(self.width, self.height)
         
-        # Загрузка конфигурации уровня
-        level_config = LEVEL_CONFIGS[self.level]
+        # Загрузка конфигурации уровня. Для уровней без собственной карты
+        # используется ближайшая предыдущая
+        known_levels = [lvl for lvl in LEVEL_CONFIGS if lvl <= self.level]
+        level_config = LEVEL_CONFIGS[max(known_levels or LEVEL_CONFIGS)]
         
         # Установка блоков
         for block_data in level_config["blocks"]:
             x, y, block_type = block_data
-            self.blocks[y][x] = Block(x, y, block_type)
+            self.terrain.set_block(x, y, block_type)
 
         # Установка флага
         self.flag_position = level_config["flag_position"]
@@ -428,122 +1105,335 @@ class GameMap:
         # Инициализация списка танков для уровня
         self.remaining_tanks = self._get_level_tanks()
 
+        # Сетка проходимости для поиска пути
+        self.grid.load_passability(self.can_move_to)
+        self.flow_field.invalidate()
+        self.prepare_pathfinder()
+        self.blockers.load(self.terrain)
+        if self.projectile_store is not None:
+            self.projectile_store.load_terrain(self)
+        if self.path_workers is not None:
+            self.path_workers.publish()
+
+    def prepare_pathfinder(self) -> None:
+        """Построение таблиц поиска пути при загрузке карты, а не
+        на первом пересчете пути посреди игры"""
+        if self.path_workers is not None or self.enemy_pathfinder == "flow":
+            # Таблицы нужны только процессам-исполнителям или не нужны вовсе
+            return
+        # Таблица соседей нужна A*, в том числе внутри JPS и HPA*
+        self.grid.get_neighbor_table()
+        if self.enemy_pathfinder == "jps":
+            self.grid.get_jump_table()
+        elif self.enemy_pathfinder == "hpa":
+            self.grid.get_hierarchy()
+
     def _get_level_tanks(self) -> List[Dict]:
         """Получение списка танков для текущего уровня"""
-        return {
-            1: [{"type": "normal", "count": 3}],
-            2: [{"type": "normal", "count": 5 }],
-            3: [{"type": "normal", "count": 7}],
-            4: [{"type": "normal", "count": 10}],
-            5: [{"type": "normal", "count": 8}, 
-                {"type": "light", "count": 2}],
-            6: [{"type": "normal", "count": 8}, 
-                {"type": "light", "count": 2},
-                {"type": "medium", "count": 1}],
-            7: [{"type": "normal", "count": 8}, 
-                {"type": "light", "count": 2},
-                {"type": "medium", "count": 2}],
-            8: [{"type": "normal", "count": 8}, 
-                {"type": "light", "count": 2},
-                {"type": "medium", "count": 2},
-                {"type": "heavy", "count": 1}],
-            9: [{"type": "normal", "count": 8}, 
-                {"type": "light", "count": 2},
-                {"type": "medium", "count": 2},
-                {"type": "heavy", "count": 2}],
-            10: [{"type": "normal", "count": 10}, 
-                {"type": "light", "count": 2},
-                {"type": "medium", "count": 2},
-                {"type": "heavy", "count": 2}],
-            11: [{"type": "boss", "count": 1}]
-        }[self.level]
-
-    def update(self, current_time: float) -> None:
+        # Копии записей: счетчики уменьшаются по мере появления танков.
+        # Для уровней без своего списка берется ближайший предыдущий
+        known_levels = [lvl for lvl in LEVEL_TANKS if lvl <= self.level]
+        level_tanks = LEVEL_TANKS[max(known_levels or LEVEL_TANKS)]
+        return [dict(entry) for entry in level_tanks]
+
+    def _sync_clock(self, current_time: Optional[float]) -> float:
+        # Явно переданное время переводит виртуальные часы карты
+        if current_time is not None:
+            self.clock.advance_to(current_time)
+        return self.clock.now()
+
+    def update(self, current_time: Optional[float] = None) -> None:
         """Обновление состояния игрового мира"""
+        current_time = self._sync_clock(current_time)
+        if self.last_update_time is not None:
+            self.dt = max(0.0, current_time - self.last_update_time)
+        self.last_update_time = current_time
+        profiler = self.profiler
+        if profiler is not None:
+            profiler.checkpoint()
+
         # Спавн новых танков
         if (self.remaining_tanks and 
             current_time >= self.next_spawn_time):
             self._spawn_tank()
             self.next_spawn_time = current_time + self.spawn_interval
+        if profiler is not None:
+            profiler.mark("spawn")
+
+        # Пересчет путей противников в пределах бюджета тика
+        self.ai_scheduler.run(self, current_time)
+        if profiler is not None:
+            profiler.mark("ai")
 
         # Обновление танков
-        for tank in self.tanks[:]:
+        for tank in self.tanks:
             tank.update(self)
             
-            # Проверка выстрелов
-            projectile = tank.shoot(current_time)
+            # Противник стреляет, только если видит игрока или флаг
+            if not self.has_line_of_fire(tank):
+                continue
+            projectile = tank.shoot(current_time, self.projectile_pool)
             if projectile:
-                self.projectiles.append(projectile)
-
-        # Обновление снарядов
-        for projectile in self.projectiles[:]:
-            if projectile.update(self):
-                self.projectiles.remove(projectile)
-
-        # Проверка столкновений
-        self._check_collisions()
-
-        # Обновление блоков
-        for row in self.blocks:
-            for block in row:
-                block.update(self)
+                self.add_projectile(projectile)
+        if profiler is not None:
+            profiler.mark("tanks")
+
+        # Обновление снарядов вместе с проверкой попаданий по пути
+        result = self._update_projectiles()
+        if profiler is not None:
+            profiler.mark("projectiles")
+        if result:
+            self.game_state = result
+        elif self.player and self.player.lives <= 0:
+            self.game_state = GameState.GAME_OVER
+        elif not self.remaining_tanks and not self.tanks:
+            self.game_state = GameState.VICTORY
+
+        # Обновление блоков: проверяются только клетки, по которым попали
+        changed_cells = self.terrain.collect_changes()
+        if changed_cells:
+            self._on_terrain_changed(changed_cells)
+        if profiler is not None:
+            profiler.mark("blocks")
 
     def _spawn_tank(self) -> None:
         """Создание нового танка"""
         if not self.remaining_tanks:
             return
 
-        spawn_point = random.choice(self.spawn_points)
+        spawn_point = self.rng.choice(self.spawn_points)
         tank_data = self.remaining_tanks[0]
         
         if tank_data["count"] > 0:
-            new_tank = EnemyTank(*spawn_point, tank_data["type"])
-            self.tanks.append(new_tank)
+            new_tank = self.tank_pool.acquire(*spawn_point, tank_data["type"],
+                                              self.enemy_pathfinder)
+            self.add_tank(new_tank)
             tank_data["count"] -= 1
             
             if tank_data["count"] == 0:
                 self.remaining_tanks.pop(0)
 
-    def _check_collisions(self) -> None:
-        """Проверка всех столкновений"""
-        # Проверка столкновений снарядов с танками
-        for projectile in self.projectiles[:]:
-            for tank in self.tanks[:]:
-                if (projectile.x == tank.x and 
-                    projectile.y == tank.y and 
-                    projectile.owner != tank):
-                    tank.health -= projectile.damage
-                    self.projectiles.remove(projectile)
-                    
-                    if tank.health <= 0:
-                        self.tanks.remove(tank)
-                        self.killed_tanks += 1
-                        break
-
-            # Проверка попадания в игрока
-            if (self.player and 
-                projectile.x == self.player.x and 
-                projectile.y == self.player.y and 
-                projectile.owner != self.player):
-                self.player.lives -= 1
-                self.deaths += 1
-                self.projectiles.remove(projectile)
-                
-                if self.player.lives <= 0:
-                    return GameState.GAME_OVER
+    def _index_projectile(self, projectile: Projectile) -> None:
+        x, y = projectile.x, projectile.y
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return
+        key = y * self.width + x
+        cell = self.projectile_index.get(key)
+        if cell is None:
+            self.projectile_index[key] = [projectile]
+        else:
+            cell.append(projectile)
+
+    def add_tank(self, tank: Tank) -> None:
+        """Добавление танка противника на карту"""
+        self.tanks.append(tank)
+        self._occupy(tank)
+
+    def move_tank(self, tank: Tank, x: int, y: int) -> None:
+        """Перемещение танка противника с обновлением индекса клеток"""
+        self._vacate(tank)
+        tank.x = x
+        tank.y = y
+        self._occupy(tank)
+
+    def _occupy(self, tank: Tank) -> None:
+        key = tank.y * self.width + tank.x
+        cell = self.tank_index.get(key)
+        if cell is None:
+            self.tank_index[key] = [tank]
+        else:
+            cell.append(tank)
+
+    def _vacate(self, tank: Tank) -> None:
+        key = tank.y * self.width + tank.x
+        cell = self.tank_index[key]
+        cell.remove(tank)
+        if not cell:
+            del self.tank_index[key]
+
+    def _update_projectiles(self) -> Optional[GameState]:
+        """Движение снарядов и применение попаданий одним проходом"""
+        self.collision_result = None
+        self.tank_killed = False
+
+        # Список уплотняется на месте, израсходованные снаряды уходят в пул
+        projectiles = self.projectiles
+        pool = self.projectile_pool
+        self.projectile_index.clear()
+        kept = 0
+        for projectile in projectiles:
+            if projectile.update(self):
+                pool.release(projectile)
+            else:
+                projectiles[kept] = projectile
+                kept += 1
+                self._index_projectile(projectile)
+        del projectiles[kept:]
+        if self.projectile_store is not None:
+            self.projectile_store.step(self)
+
+        if self.tank_killed:
+            self._remove_dead_tanks()
+        return self.collision_result
+
+    def _remove_dead_tanks(self) -> None:
+        """Удаление подбитых танков с возвратом в пул (порядок сохраняется)"""
+        tanks = self.tanks
+        kept = 0
+        for tank in tanks:
+            if tank.health > 0:
+                tanks[kept] = tank
+                kept += 1
+                continue
+            self._vacate(tank)
+            if isinstance(tank, EnemyTank):
+                if tank.pending_path is not None:
+                    tank.pending_path.cancel()
+                    tank.pending_path = None
+                self.tank_pool.release(tank)
+        del tanks[kept:]
+
+    def check_projectile_hit(self, projectile: Projectile) -> bool:
+        """Попадание снаряда в танк, игрока или флаг в его текущей клетке"""
+        return self.apply_hit(projectile.x, projectile.y, projectile.damage,
+                              projectile.owner_uid)
+
+    def apply_hit(self, x: int, y: int, damage: int, owner_uid: int) -> bool:
+        """Применение попадания в клетке (x, y), True - снаряд израсходован"""
+        # Снаряд проверяет только танки своей клетки из индекса
+        key = y * self.width + x
+        for tank in self.tank_index.get(key, ()):
+            if tank.health > 0 and tank.uid != owner_uid:
+                tank.health -= damage
+                if tank.health <= 0:
+                    self.killed_tanks += 1
+                    self.tank_killed = True
+                return True
+
+        # Проверка попадания в игрока
+        player = self.player
+        if (player and 
+            x == player.x and 
+            y == player.y and 
+            player.uid != owner_uid):
+            player.lives -= 1
+            self.deaths += 1
+            if player.lives <= 0:
+                self.collision_result = GameState.GAME_OVER
+            return True
 
-            # Проверка попадания во флаг
-            if (projectile.x == self.flag_position[0] and 
-                projectile.y == self.flag_position[1]):
-                return GameState.GAME_OVER
+        # Проверка попадания во флаг
+        if x == self.flag_position[0] and y == self.flag_position[1]:
+            self.collision_result = GameState.GAME_OVER
+            return True
+        return False
 
     def can_move_to(self, x: int, y: int) -> bool:
         """Проверка возможности движения в указанную позицию"""
-        if not (0 <= x < self.width and 0 <= y < self.height):
+        return self.terrain.is_passable(x, y)
+
+    def is_occupied(self, x: int, y: int) -> bool:
+        """Проверка, стоит ли в клетке танк"""
+        if self.player and (self.player.x, self.player.y) == (x, y):
+            return True
+        return (0 <= x < self.width and 0 <= y < self.height and
+                y * self.width + x in self.tank_index)
+
+    def has_line_of_fire(self, tank: Tank) -> bool:
+        """Есть ли игрок или флаг на линии огня танка без преград"""
+        flag_x, flag_y = self.flag_position
+        if self._is_clear_shot(tank, flag_x, flag_y):
+            return True
+        player = self.player
+        return bool(player) and self._is_clear_shot(tank, player.x, player.y)
+
+    def _is_clear_shot(self, tank: Tank, target_x: int, target_y: int) -> bool:
+        dx, dy = DIRECTION_OFFSETS[tank.direction]
+        # Цель должна быть впереди в той же строке или том же столбце
+        if dx and (target_y != tank.y or (target_x - tank.x) * dx <= 0):
             return False
-            
-        block = self.blocks[y][x]
-        return block.block_type in ["air", "bush"]
+        if dy and (target_x != tank.x or (target_y - tank.y) * dy <= 0):
+            return False
+        return self.blockers.is_clear(tank.x, tank.y, target_x, target_y)
+
+    def get_enemy_target(self) -> Tuple[int, int]:
+        """Цель противников: игрок, а без него - флаг"""
+        if self.player:
+            return self.player.get_position()
+        return self.flag_position
+
+    def enable_projectile_store(self) -> None:
+        """Переключение на векторный движок снарядов (нужен NumPy)"""
+        self.projectile_store = ProjectileStore(self.width, self.height)
+        self.projectile_store.load_terrain(self)
+        for projectile in self.projectiles:
+            self.projectile_store.add(projectile)
+            self.projectile_pool.release(projectile)
+        self.projectiles = []
+        self.projectile_index.clear()
+
+    def enable_path_workers(self, workers: int = 1) -> None:
+        """Поиск пути противников в отдельных процессах"""
+        self.path_workers = PathWorkerPool(self.grid, workers)
+
+    def close(self) -> None:
+        """Освобождение ресурсов карты (процессов поиска пути)"""
+        if self.path_workers is not None:
+            self.path_workers.close()
+            self.path_workers = None
+
+    def add_projectile(self, projectile: Projectile) -> None:
+        if self.projectile_store is not None:
+            # Хранилище копирует снаряд в свои массивы, объект снова свободен
+            self.projectile_store.add(projectile)
+            self.projectile_pool.release(projectile)
+        else:
+            self.projectiles.append(projectile)
+            self._index_projectile(projectile)
+
+    def projectile_count(self) -> int:
+        store = self.projectile_store
+        return len(self.projectiles) + (len(store) if store is not None else 0)
+
+    def add_terrain_listener(self, listener: Callable[[List[Tuple[int, int]]], None]) -> None:
+        """Подписка на изменения местности (например, для рендерера)"""
+        self.terrain_listeners.append(listener)
+
+    def _on_terrain_changed(self, cells: List[Tuple[int, int]]) -> None:
+        """Обновление кэшей поиска пути после изменения проходимости"""
+        if self.projectile_store is not None:
+            self.projectile_store.update_cells(self, cells)
+        self.blockers.update_cells(self.terrain, cells)
+        for x, y in cells:
+            self.grid.set_passable(x, y, self.can_move_to(x, y))
+        self.flow_field.repair(cells)
+        if self.path_workers is not None:
+            self.path_workers.publish_cells(cells)
+
+        # Открытие клеток не ломает уже найденные пути A*, а закрытие -
+        # ломает, поэтому такие пути пересчитываются при следующем обновлении
+        blocked = {cell for cell in cells if not self.can_move_to(*cell)}
+        if blocked:
+            for tank in self.tanks:
+                if not isinstance(tank, EnemyTank):
+                    continue
+                if blocked.intersection(tank.path):
+                    tank.path = []
+                    tank.last_path_update = float('-inf')
+                if tank.pending_path is not None:
+                    # Поиск по старому снимку карты больше не нужен
+                    tank.pending_path.cancel()
+                    tank.pending_path = None
+                    tank.last_path_update = float('-inf')
+
+        for listener in self.terrain_listeners:
+            listener(cells)
+
+    def get_flow_field(self, target: Tuple[int, int]) -> FlowField:
+        """Поле потока к цели, перестраивается только при ее смене"""
+        if self.flow_field.target != target:
+            self.flow_field.build(target)
+        return self.flow_field
 
     def get_neighbors(self, x: int, y: int) -> List[Tuple[int, int]]:
         """Получение списка соседних клеток для pathfinding"""
@@ -554,43 +1444,971 @@ class GameMap:
                 neighbors.append((new_x, new_y))
         return neighbors
 
-    def render(self, screen) -> None:
-        """Отрисовка всего игрового мира"""
-        # Отрисовка блоков
-        for row in self.blocks:
-            for block in row:
-                block.render(screen)
-
+    def visible_tanks(self, camera: Camera) -> List[Tank]:
+        """Танки противника в камере"""
+        area = camera.width * camera.height
+        if area >= len(self.tanks):
+            return [tank for tank in self.tanks if camera.contains(tank.x, tank.y)]
+        # Камера меньше числа танков - обходим ее клетки по индексу танков
+        visible = []
+        index = self.tank_index
+        for y in range(camera.y, camera.y + camera.height):
+            row = y * self.width
+            for x in range(camera.x, camera.x + camera.width):
+                for tank in index.get(row + x, ()):
+                    if tank.health > 0:
+                        visible.append(tank)
+        return visible
+
+    def visible_projectiles(self, camera: Camera) -> List[Projectile]:
+        """Снаряды в камере"""
+        area = camera.width * camera.height
+        if area >= len(self.projectiles):
+            return [projectile for projectile in self.projectiles
+                    if camera.contains(projectile.x, projectile.y)]
+        # Снарядов больше, чем клеток камеры - обходим ее клетки по индексу
+        visible = []
+        index = self.projectile_index
+        for y in range(camera.y, camera.y + camera.height):
+            row = y * self.width
+            for x in range(camera.x, camera.x + camera.width):
+                cell = index.get(row + x)
+                if cell:
+                    visible.extend(cell)
+        return visible
+
+    def render_objects(self, screen, camera: Camera) -> None:
+        """Отрисовка подвижных объектов поверх местности"""
         # Отрисовка танков
-        for tank in self.tanks:
+        for tank in self.visible_tanks(camera):
             tank.render(screen)
 
         # Отрисовка снарядов
-        for projectile in self.projectiles:
+        for projectile in self.visible_projectiles(camera):
             projectile.render(screen)
+        if self.projectile_store is not None:
+            self.projectile_store.render(screen, camera)
 
         # Отрисовка игрока
         if self.player:
             self.player.render(screen)
 
         # Отрисовка флага
-        screen.addch(self.flag_position[1], self.flag_position[0], "F", 
-                    curses.color_pair(1))
+        try:
+            screen.addch(self.flag_position[1], self.flag_position[0], "F",
+                         color_pair(1))
+        except curses.error:
+            pass
 
     def get_pressed_keys(self) -> Dict:
         return self.pressed_keys
 
+    def handle_key(self, key: int, current_time: Optional[float] = None) -> None:
+        """Применение нажатой клавиши к танку игрока"""
+        if not self.player or key == -1:
+            return
+        current_time = self._sync_clock(current_time)
+
+        if key == ord(' '):  # Выстрел
+            projectile = self.player.shoot(current_time, self.projectile_pool)
+            if projectile:
+                self.add_projectile(projectile)
+        elif key == ord('\t'):  # Смена оружия
+            self.player.switch_weapon()
+        elif key in (curses.KEY_UP, curses.KEY_DOWN,
+                     curses.KEY_LEFT, curses.KEY_RIGHT):
+            self.pressed_keys = {key: True}
+            self.player.update(self)
+            self.pressed_keys = {}
+
+    def get_stats(self) -> Dict:
+        """Итоговая статистика текущего матча"""
+        return {
+            'level': self.level,
+            'state': self.game_state.value,
+            'score': self.player.score if self.player else 0,
+            'lives': self.player.lives if self.player else 0,
+            'killed_tanks': self.killed_tanks,
+            'deaths': self.deaths,
+            'tanks_alive': len(self.tanks),
+            'projectiles': self.projectile_count()
+        }
+
+# Отрисовщики игрового мира
+class Renderer(ABC):
+    @abstractmethod
+    def render(self, game_map: GameMap) -> None:
+        pass
+
+# Кадр в памяти: символ и атрибут каждой клетки. Поддерживает те же
+# методы addch/addstr, что и окно curses, поэтому объекты рисуются в него
+# без изменений
+class FrameBuffer:
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.glyphs = [" "] * (width * height)
+        self.attrs = [0] * (width * height)
+
+    def getmaxyx(self) -> Tuple[int, int]:
+        return (self.height, self.width)
+
+    def addch(self, y: int, x: int, ch: str, attr: int = 0) -> None:
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise curses.error("addch() returned ERR")
+        index = y * self.width + x
+        self.glyphs[index] = ch
+        self.attrs[index] = attr
+
+    def addstr(self, y: int, x: int, text: str, attr: int = 0) -> None:
+        for offset, ch in enumerate(text):
+            self.addch(y, x + offset, ch, attr)
+
+# Отрисовщик, который хранит предыдущий кадр и выводит в терминал только
+# изменившиеся клетки, объединяя соседние клетки строки в один addstr
+class DiffRenderer(Renderer):
+    def __init__(self, screen, top: int = 0):
+        self.screen = screen
+        # Первая строка экрана под карту (выше - HUD)
+        self.top = top
+        self.camera = Camera(0, 0)
+        self.previous: Optional[FrameBuffer] = None
+        # Второй буфер: кадры чередуются, чтобы не создавать новый каждый раз
+        self.spare: Optional[FrameBuffer] = None
+        self.color_pairs: Dict[int, int] = {}
+        self.cells_drawn = 0
+        self.writes = 0
+
+    def invalidate(self) -> None:
+        """Полная перерисовка на следующем кадре (после очистки экрана)"""
+        self.previous = None
+
+    def _color_pair(self, pair: int) -> int:
+        attr = self.color_pairs.get(pair)
+        if attr is None:
+            attr = self.color_pairs[pair] = color_pair(pair)
+        return attr
+
+    def view_size(self) -> Tuple[int, int]:
+        """Размер области экрана под карту: (ширина, высота)"""
+        height, width = self.screen.getmaxyx()
+        return (width, height - self.top)
+
+    def _update_camera(self, game_map: GameMap) -> None:
+        width, height = self.view_size()
+        width = max(0, min(width, game_map.width))
+        height = max(0, min(height, game_map.height))
+        camera = self.camera
+        if (camera.width, camera.height) != (width, height):
+            camera.width = width
+            camera.height = height
+            self.previous = None
+        if game_map.player:
+            camera.follow(game_map.player.x, game_map.player.y,
+                          game_map.width, game_map.height)
+
+    def _draw_terrain(self, frame: FrameBuffer, game_map: GameMap) -> None:
+        # Копирование видимого окна местности, стоимость - размер камеры
+        camera = self.camera
+        types = game_map.terrain.types
+        symbols = Terrain.SYMBOLS
+        attrs = [self._color_pair(pair) for pair in Terrain.COLOR_PAIRS]
+        for row in range(camera.height):
+            start = (camera.y + row) * game_map.width + camera.x
+            codes = types[start:start + camera.width]
+            offset = row * camera.width
+            frame.glyphs[offset:offset + camera.width] = [symbols[c] for c in codes]
+            frame.attrs[offset:offset + camera.width] = [attrs[c] for c in codes]
+
+    def render(self, game_map: GameMap) -> None:
+        self._update_camera(game_map)
+        camera = self.camera
+        frame = self.spare
+        if frame is None or (frame.width, frame.height) != (camera.width,
+                                                            camera.height):
+            # Местность перезаписывает весь кадр, очищать буфер не нужно
+            frame = FrameBuffer(camera.width, camera.height)
+        profiler = game_map.profiler
+        if profiler is not None:
+            profiler.checkpoint()
+        self._draw_terrain(frame, game_map)
+        if profiler is not None:
+            profiler.mark("render.terrain")
+        game_map.render_objects(CameraSurface(frame, camera), camera)
+        if profiler is not None:
+            profiler.mark("render.objects")
+        self._flush(frame)
+        if profiler is not None:
+            profiler.mark("render.flush")
+        self.spare, self.previous = self.previous, frame
+
+    def _flush(self, frame: FrameBuffer) -> None:
+        self._begin_frame()
+        previous = self.previous
+        glyphs, attrs = frame.glyphs, frame.attrs
+        width = frame.width
+        for y in range(frame.height):
+            row = y * width
+            x = 0
+            while x < width:
+                index = row + x
+                if (previous is not None and
+                        previous.glyphs[index] == glyphs[index] and
+                        previous.attrs[index] == attrs[index]):
+                    x += 1
+                    continue
+                # Серия изменившихся клеток с одинаковым атрибутом
+                attr = attrs[index]
+                end = x + 1
+                while end < width:
+                    index = row + end
+                    if attrs[index] != attr or (
+                            previous is not None and
+                            previous.glyphs[index] == glyphs[index] and
+                            previous.attrs[index] == attr):
+                        break
+                    end += 1
+                self._draw_run(y, x, "".join(glyphs[row + x:row + end]), attr)
+                self.cells_drawn += end - x
+                x = end
+        self._end_frame()
+
+    def _begin_frame(self) -> None:
+        pass
+
+    def _draw_run(self, y: int, x: int, text: str, attr: int) -> None:
+        try:
+            self.screen.addstr(y + self.top, x, text, attr)
+        except curses.error:
+            pass
+        self.writes += 1
+
+    def _end_frame(self) -> None:
+        pass
+
+# Отрисовщик в виде ANSI-последовательностей без curses: изменившиеся серии
+# клеток собираются в один буфер и выводятся одним вызовом os.write
+class AnsiRenderer(DiffRenderer):
+    RESET = b"\x1b[0m"
+
+    def __init__(self, fd: int = 1, capacity: int = 16384, top: int = 0):
+        super().__init__(None, top)
+        self.fd = fd
+        try:
+            size = os.get_terminal_size(fd)
+            self.size = (size.columns, size.lines)
+        except OSError:
+            self.size = (80, 24)
+        self.buffer = bytearray(capacity)
+        self.length = 0
+        self.cursor: Optional[Tuple[int, int]] = None
+        self.attr: Optional[int] = None
+        self.frames = 0
+        self.bytes_written = 0
+
+    def view_size(self) -> Tuple[int, int]:
+        return (self.size[0], self.size[1] - self.top)
+
+    def _emit(self, data: bytes) -> None:
+        end = self.length + len(data)
+        if end > len(self.buffer):
+            self.buffer.extend(bytes(max(end, 2 * len(self.buffer)) - len(self.buffer)))
+        self.buffer[self.length:end] = data
+        self.length = end
+
+    def _sgr(self, attr: int) -> bytes:
+        color = PAIR_COLORS.get((attr & curses.A_COLOR) >> 8)
+        if color is None:
+            return self.RESET
+        return b"\x1b[0;%dm" % (30 + color)
+
+    def _begin_frame(self) -> None:
+        self.length = 0
+        if self.previous is None:
+            # Полный кадр: очистка экрана и скрытие курсора
+            self._emit(b"\x1b[?25l\x1b[2J")
+            self.cursor = None
+            self.attr = None
+
+    def _draw_run(self, y: int, x: int, text: str, attr: int) -> None:
+        # Перемещение курсора только если серия не продолжает предыдущую
+        if self.cursor != (y, x):
+            self._emit(b"\x1b[%d;%dH" % (y + self.top + 1, x + 1))
+        if attr != self.attr:
+            self._emit(self._sgr(attr))
+            self.attr = attr
+        self._emit(text.encode("utf-8"))
+        self.cursor = (y, x + len(text))
+
+    def _end_frame(self) -> None:
+        self.frames += 1
+        view = memoryview(self.buffer)[:self.length]
+        while view:
+            written = os.write(self.fd, view)
+            view = view[written:]
+            self.bytes_written += written
+            self.writes += 1
+
+    def close(self) -> None:
+        """Сброс цвета и возврат курсора"""
+        os.write(self.fd, self.RESET + b"\x1b[?25h\n")
+
+class NullRenderer(Renderer):
+    """Отрисовщик-заглушка для работы без терминала"""
+    def render(self, game_map: GameMap) -> None:
+        pass
+
+# Игровой цикл с фиксированным шагом симуляции: реальное время копится в
+# аккумуляторе и расходуется целыми тиками, отрисовка идет со своей частотой
+# и пропускается, если симуляция не успевает
+class GameLoop:
+    def __init__(self, tick_rate: float = FPS, render_rate: float = FPS,
+                 max_steps: int = MAX_STEPS_PER_FRAME,
+                 clock: Callable[[], float] = time.perf_counter,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.tick_time = 1.0 / tick_rate
+        self.render_time = 1.0 / render_rate
+        self.max_steps = max_steps
+        self.clock = clock
+        self.sleep = sleep
+        self.sim_time = 0.0
+        self.ticks = 0
+        self.frames = 0
+        self.skipped_frames = 0
+        self.skipped_in_row = 0
+        # Реальное время, отброшенное из-за ограничения числа шагов
+        self.dropped_time = 0.0
+        self.reset()
+
+    def reset(self) -> None:
+        """Начать отсчет заново (например, после паузы)"""
+        self.accumulator = 0.0
+        self.last_time: Optional[float] = None
+        self.next_render = 0.0
+
+    def run_frame(self, step: Callable[[float], None],
+                  render: Callable[[], None]) -> int:
+        """Один проход цикла: шаги симуляции, отрисовка и сон до следующего
+        события. Возвращает число выполненных тиков"""
+        now = self.clock()
+        if self.last_time is None:
+            self.last_time = now
+            self.next_render = now
+        self.accumulator += now - self.last_time
+        self.last_time = now
+
+        # Допуск на ошибку округления при накоплении долей тика
+        tick_due = self.tick_time - 1e-9
+        steps = 0
+        while self.accumulator >= tick_due and steps < self.max_steps:
+            step(self.sim_time)
+            self.accumulator -= self.tick_time
+            self.ticks += 1
+            # Время считается от номера тика, без накопления ошибки округления
+            self.sim_time = self.ticks * self.tick_time
+            steps += 1
+
+        behind = self.accumulator >= tick_due
+        if behind:
+            # Симуляция не успевает за реальным временем: отбрасываем
+            # отставание вместо бесконечного догоняния
+            dropped = self.accumulator - self.accumulator % self.tick_time
+            self.dropped_time += dropped
+            self.accumulator -= dropped
+
+        now = self.clock()
+        if now >= self.next_render:
+            # При отставании кадр пропускается, но не больше max_steps подряд,
+            # чтобы картинка не замирала при постоянной перегрузке
+            if behind and self.skipped_in_row < self.max_steps:
+                self.skipped_frames += 1
+                self.skipped_in_row += 1
+            else:
+                render()
+                self.frames += 1
+                self.skipped_in_row = 0
+            self.next_render = max(self.next_render + self.render_time, now)
+
+        # Сон до ближайшего тика или кадра
+        next_tick = self.last_time + self.tick_time - self.accumulator
+        delay = min(next_tick, self.next_render) - self.clock()
+        if delay > 0:
+            self.sleep(delay)
+        return steps
+
+# Простой бот, управляющий танком игрока без участия человека
+class BotPlayer:
+    MOVE_KEYS = {
+        Direction.UP: curses.KEY_UP,
+        Direction.DOWN: curses.KEY_DOWN,
+        Direction.LEFT: curses.KEY_LEFT,
+        Direction.RIGHT: curses.KEY_RIGHT
+    }
+    # Клавиши без цели: любое движение или бездействие
+    IDLE_KEYS = tuple(MOVE_KEYS.values()) + (-1,)
+
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+
+    def choose_key(self, game_map: GameMap) -> int:
+        """Выбор клавиши: стрелять по врагу на линии огня или идти к нему"""
+        player = game_map.player
+        if not player or not game_map.tanks:
+            return self.rng.choice(self.IDLE_KEYS)
+
+        target = min(game_map.tanks, key=lambda tank:
+                     abs(tank.x - player.x) + abs(tank.y - player.y))
+        dx = target.x - player.x
+        dy = target.y - player.y
+
+        if dx == 0 or dy == 0:
+            if dx > 0:
+                wanted = Direction.RIGHT
+            elif dx < 0:
+                wanted = Direction.LEFT
+            elif dy > 0:
+                wanted = Direction.DOWN
+            else:
+                wanted = Direction.UP
+            if player.direction == wanted:
+                return ord(' ')
+            return self.MOVE_KEYS[wanted]
+
+        # Выходим на одну линию с целью по более короткой оси
+        if abs(dx) < abs(dy):
+            wanted = Direction.RIGHT if dx > 0 else Direction.LEFT
+        else:
+            wanted = Direction.DOWN if dy > 0 else Direction.UP
+        if self.rng.random() < 0.1:
+            wanted = self.rng.choice(list(self.MOVE_KEYS))
+        return self.MOVE_KEYS[wanted]
+
+# Формат записи матча: заголовок (сигнатура, версия, уровень, зерно,
+# длительность тика, алгоритм поиска пути), затем события (тик, клавиша).
+# Последнее событие с клавишей REPLAY_END хранит число тиков матча
+REPLAY_MAGIC = b"TNKR"
+REPLAY_VERSION = 3
+REPLAY_HEADER = struct.Struct("<4sBHQd8sd")
+REPLAY_EVENT = struct.Struct("<IH")
+REPLAY_END = 0xFFFF
+
+# Запись ввода во время игры: события пишутся в файл по мере поступления
+class ReplayRecorder:
+    def __init__(self, path: str, level: int, seed: int,
+                 tick_time: float = FRAME_TIME, pathfinder: str = "flow",
+                 ai_budget_us: float = AI_BUDGET_US):
+        self.file = open(path, "wb")
+        self.file.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, level,
+                                           seed, tick_time,
+                                           pathfinder.encode("ascii"),
+                                           ai_budget_us))
+
+    def record(self, tick: int, key: int) -> None:
+        if 0 <= key < REPLAY_END:
+            self.file.write(REPLAY_EVENT.pack(tick, key))
+
+    def close(self, end_tick: int) -> None:
+        if not self.file.closed:
+            self.file.write(REPLAY_EVENT.pack(end_tick, REPLAY_END))
+            self.file.close()
+
+# Загруженная запись матча
+class Replay:
+    def __init__(self, level: int, seed: int, tick_time: float,
+                 pathfinder: str, ai_budget_us: float,
+                 events: List[Tuple[int, int]], end_tick: Optional[int]):
+        self.level = level
+        self.seed = seed
+        self.tick_time = tick_time
+        self.pathfinder = pathfinder
+        # Бюджет ИИ влияет на порядок пересчета путей, поэтому он тоже
+        # нужен для точного повтора
+        self.ai_budget_us = ai_budget_us
+        self.events = events
+        # None - запись оборвалась (игра упала), играем до последнего события
+        self.end_tick = end_tick
+
+    @classmethod
+    def load(cls, path: str) -> 'Replay':
+        with open(path, "rb") as file:
+            data = file.read()
+        if len(data) < REPLAY_HEADER.size:
+            raise ValueError(f"{path}: слишком короткий файл записи")
+        magic, version, level, seed, tick_time, pathfinder, ai_budget_us = \
+            REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path}: неизвестный формат записи")
+
+        events = []
+        end_tick = None
+        body = data[REPLAY_HEADER.size:]
+        body = body[:len(body) - len(body) % REPLAY_EVENT.size]
+        for tick, key in REPLAY_EVENT.iter_unpack(body):
+            if key == REPLAY_END:
+                end_tick = tick
+                break
+            events.append((tick, key))
+        return cls(level, seed, tick_time,
+                   pathfinder.rstrip(b"\0").decode("ascii"), ai_budget_us,
+                   events, end_tick)
+
+    def keys_by_tick(self) -> Dict[int, List[int]]:
+        keys: Dict[int, List[int]] = {}
+        for tick, key in self.events:
+            keys.setdefault(tick, []).append(key)
+        return keys
+
+    @property
+    def length(self) -> int:
+        """Число тиков, которое нужно проиграть"""
+        if self.end_tick is not None:
+            return self.end_tick
+        return self.events[-1][0] + 1 if self.events else 0
+
+def run_replay(replay: Replay, renderer: Optional[Renderer] = None,
+               speed: Optional[float] = None,
+               numpy_projectiles: bool = False) -> Dict:
+    """Повтор записанного матча: без speed - с максимальной скоростью,
+    иначе в speed раз быстрее реального времени"""
+    renderer = renderer or NullRenderer()
+    game_map = GameMap(20, 10, replay.level, seed=replay.seed,
+                       ai_budget_us=replay.ai_budget_us)
+    game_map.enemy_pathfinder = replay.pathfinder
+    if numpy_projectiles:
+        game_map.enable_projectile_store()
+    game_map.initialize_level()
+
+    keys = replay.keys_by_tick()
+    tick_time = replay.tick_time
+    ticks = 0
+
+    def step(_sim_time: float) -> None:
+        nonlocal ticks
+        current_time = ticks * tick_time
+        for key in keys.get(ticks, ()):
+            game_map.handle_key(key, current_time)
+        game_map.update(current_time)
+        ticks += 1
+
+    def running() -> bool:
+        return ticks < replay.length and game_map.game_state == GameState.PLAYING
+
+    started = time.perf_counter()
+    if speed is None:
+        while running():
+            step(0.0)
+            renderer.render(game_map)
+    else:
+        tick_rate = speed / tick_time
+        loop = GameLoop(tick_rate, min(tick_rate, FPS), max_steps=1)
+        while running():
+            loop.run_frame(step, lambda: renderer.render(game_map))
+    elapsed = time.perf_counter() - started
+
+    stats = game_map.get_stats()
+    stats.update({
+        'seed': replay.seed,
+        'ticks': ticks,
+        'sim_time': ticks * tick_time,
+        'wall_time': elapsed,
+        'ticks_per_sec': ticks / elapsed if elapsed > 0 else 0.0
+    })
+    return stats
+
+def run_headless(level: int, ticks: int, seed: int,
+                 renderer: Optional[Renderer] = None,
+                 tick_time: float = FRAME_TIME,
+                 pathfinder: str = "flow",
+                 numpy_projectiles: bool = False,
+                 clock: Optional[SimClock] = None,
+                 recorder: Optional[ReplayRecorder] = None,
+                 spawn_interval: Optional[float] = None,
+                 path_workers: int = 0,
+                 profiler: Optional[FrameProfiler] = None,
+                 ai_budget_us: float = AI_BUDGET_US) -> Dict:
+    """Прогон матча без терминала с максимальной скоростью.
+    С виртуальными часами (по умолчанию) каждый тик длится tick_time
+    игровых секунд, с реальными или ускоренными - время идет по ним"""
+    renderer = renderer or NullRenderer()
+    bot = BotPlayer(random.Random(seed))
+    clock = clock or SimClock.virtual()
+
+    game_map = GameMap(20, 10, level, clock, seed, ai_budget_us)
+    game_map.enemy_pathfinder = pathfinder
+    if spawn_interval is not None:
+        game_map.spawn_interval = spawn_interval
+    if path_workers:
+        game_map.enable_path_workers(path_workers)
+    if numpy_projectiles:
+        game_map.enable_projectile_store()
+    game_map.initialize_level()
+    game_map.profiler = profiler
+
+    tick = 0
+    started = time.perf_counter()
+    while tick < ticks and game_map.game_state == GameState.PLAYING:
+        if clock.is_virtual:
+            clock.advance_to(tick * tick_time)
+        key = bot.choose_key(game_map)
+        if recorder is not None:
+            recorder.record(tick, key)
+        game_map.handle_key(key)
+        game_map.update()
+        renderer.render(game_map)
+        if profiler is not None:
+            profiler.end_frame()
+        tick += 1
+    elapsed = time.perf_counter() - started
+    game_map.close()
+
+    stats = game_map.get_stats()
+    stats.update({
+        'seed': seed,
+        'ticks': tick,
+        'sim_time': tick * tick_time if clock.is_virtual else clock.now(),
+        'wall_time': elapsed,
+        'ticks_per_sec': tick / elapsed if elapsed > 0 else 0.0
+    })
+    if recorder is not None:
+        recorder.close(tick)
+    return stats
+
+def _batch_match(job: Dict) -> Dict:
+    """Один матч пакетного прогона (выполняется в процессе пула)"""
+    stats = run_headless(job["level"], job["ticks"], job["seed"],
+                         pathfinder=job["pathfinder"],
+                         numpy_projectiles=job["numpy_projectiles"],
+                         spawn_interval=job["spawn_interval"],
+                         ai_budget_us=job["ai_budget_us"])
+    stats["spawn_interval"] = job["spawn_interval"]
+    stats["pathfinder"] = job["pathfinder"]
+    return stats
+
+def run_batch(levels: List[int], matches: int, seed: int = 0,
+              ticks: int = 10000, workers: Optional[int] = None,
+              pathfinder: str = "flow",
+              spawn_intervals: Optional[List[float]] = None,
+              numpy_projectiles: bool = False,
+              ai_budget_us: float = AI_BUDGET_US) -> List[Dict]:
+    """Прогон matches матчей для каждого сочетания уровня и интервала
+    появления танков в пуле процессов. Зерно матча зависит только от его
+    номера, поэтому результат не зависит от числа процессов"""
+    jobs = []
+    for level in levels:
+        for spawn_interval in spawn_intervals or [None]:
+            for match in range(matches):
+                jobs.append({
+                    "level": level,
+                    "ticks": ticks,
+                    "seed": seed + match,
+                    "pathfinder": pathfinder,
+                    "numpy_projectiles": numpy_projectiles,
+                    "spawn_interval": spawn_interval,
+                    "ai_budget_us": ai_budget_us
+                })
+
+    workers = workers or os.cpu_count() or 1
+    # Матчи короткие - раздаем их процессам пачками
+    chunksize = max(1, len(jobs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_batch_match, jobs, chunksize=chunksize))
+
+def summarize_batch(results: List[Dict]) -> List[Dict]:
+    """Сводка по каждому сочетанию уровня и интервала появления"""
+    groups: Dict[Tuple, List[Dict]] = {}
+    for stats in results:
+        key = (stats["level"], stats["spawn_interval"])
+        groups.setdefault(key, []).append(stats)
+
+    summary = []
+    for (level, spawn_interval), group in sorted(
+            groups.items(), key=lambda item: (item[0][0], item[0][1] or 0)):
+        count = len(group)
+        wall_time = sum(stats["wall_time"] for stats in group)
+        ticks = sum(stats["ticks"] for stats in group)
+        summary.append({
+            "level": level,
+            "spawn_interval": spawn_interval,
+            "matches": count,
+            "win_rate": sum(stats["state"] == GameState.VICTORY.value
+                            for stats in group) / count,
+            "loss_rate": sum(stats["state"] == GameState.GAME_OVER.value
+                             for stats in group) / count,
+            "avg_duration": sum(stats["sim_time"] for stats in group) / count,
+            "avg_kills": sum(stats["killed_tanks"] for stats in group) / count,
+            "avg_deaths": sum(stats["deaths"] for stats in group) / count,
+            "ticks_per_sec": ticks / wall_time if wall_time > 0 else 0.0
+        })
+    return summary
+
+def write_batch(path: str, results: List[Dict], summary: List[Dict]) -> None:
+    """Сохранение результатов: .json - матчи и сводка, иначе CSV-сводка"""
+    if path.endswith(".json"):
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({"summary": summary, "matches": results}, file, indent=2)
+        return
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=list(summary[0]) if summary else [])
+        writer.writeheader()
+        writer.writerows(summary)
+
+# Сценарии замеров производительности: стандартные уровни и синтетические
+# карты с заданным числом противников. storm - снарядов, добавляемых за тик
+BENCHMARK_SCENARIOS: Dict[str, Dict] = {
+    **{f"level-{level}": {"level": level, "ticks": 600}
+       for level in sorted(LEVEL_CONFIGS)},
+    "200x100-e10": {"size": (200, 100), "enemies": 10, "ticks": 300},
+    "200x100-e100": {"size": (200, 100), "enemies": 100, "ticks": 300},
+    "200x100-e1000": {"size": (200, 100), "enemies": 1000, "ticks": 100},
+    "1000x1000-e10": {"size": (1000, 1000), "enemies": 10, "ticks": 30},
+    "1000x1000-e100": {"size": (1000, 1000), "enemies": 100, "ticks": 30},
+    "1000x1000-e1000": {"size": (1000, 1000), "enemies": 1000, "ticks": 30},
+    "storm-200x100": {"size": (200, 100), "enemies": 10, "storm": 50,
+                      "ticks": 300},
+    "storm-200x100-numpy": {"size": (200, 100), "enemies": 10, "storm": 50,
+                            "ticks": 300, "numpy": True},
+    # Десять минут игры при 60 тиках в секунду под постоянным огнем
+    "soak-level-1": {"level": 1, "storm": 5, "ticks": 10 * 60 * FPS}
+}
+# Доля непроходимых клеток синтетических карт
+BENCHMARK_DENSITY = 0.15
+# Метрики, по которым ищутся регрессии (все - чем меньше, тем лучше),
+# и их порог шума. Рост меньше порога регрессией не считается, а при
+# нулевом базовом значении порог служит абсолютным пределом.
+# Пропускная способность сравнивается через среднее время тика, чтобы
+# у нее тоже был порог в миллисекундах
+BENCHMARK_METRICS = {
+    "tick_mean_ms": 0.05,
+    "tick_p50_ms": 0.1,
+    "tick_p99_ms": 0.1,
+    "render_p50_ms": 0.1,
+    "bytes_per_frame": 16.0,
+    "peak_memory_mb": 1.0,
+    "gc_pause_ms": 5.0,
+    "gc_collections": 10,
+    "alloc_bytes_per_tick": 256.0,
+    "pool_misses": 64
+}
+# Сколько раз прогоняется каждый сценарий. Для метрик сравнения берется
+# лучший прогон (шум соседних процессов только ухудшает замер),
+# для остальных - медиана
+BENCHMARK_REPEATS = 5
+# Сколько тиков после замера времени прогоняется под tracemalloc для
+# подсчета памяти, выделяемой за тик (трассировка сильно замедляет игру)
+BENCHMARK_ALLOC_TICKS = 300
+
+# Число сборок мусора и их паузы (через gc.callbacks)
+class GcMonitor:
+    def __init__(self):
+        self.collections = 0
+        self.pause_time = 0.0
+        self.max_pause = 0.0
+        self.started = 0.0
+
+    def _callback(self, phase: str, info: Dict) -> None:
+        if phase == "start":
+            self.started = time.perf_counter()
+            return
+        pause = time.perf_counter() - self.started
+        self.collections += 1
+        self.pause_time += pause
+        self.max_pause = max(self.max_pause, pause)
+
+    def start(self) -> None:
+        gc.callbacks.append(self._callback)
+
+    def stop(self) -> None:
+        gc.callbacks.remove(self._callback)
+
+def _build_scenario(scenario: Dict, seed: int) -> GameMap:
+    """Карта сценария с неуязвимым игроком"""
+    rng = random.Random(seed)
+    if "level" in scenario:
+        game_map = GameMap(20, 10, scenario["level"], seed=seed)
+        if scenario.get("numpy"):
+            game_map.enable_projectile_store()
+        game_map.initialize_level()
+    else:
+        width, height = scenario["size"]
+        game_map = GameMap(width, height, 1, seed=seed)
+        if scenario.get("numpy"):
+            game_map.enable_projectile_store()
+        game_map.initialize_level()
+        game_map.remaining_tanks = []
+        game_map.terrain = Terrain(width, height)
+        for index in range(width * height):
+            if rng.random() < BENCHMARK_DENSITY:
+                game_map.terrain.set_block(index % width, index // width,
+                                           rng.choice(("brick", "metal")))
+        free = [index for index, code in enumerate(game_map.terrain.types)
+                if Terrain.PASSABLE[code]]
+        cells = rng.sample(free, scenario["enemies"] + 2)
+        game_map.player.x, game_map.player.y = cells[0] % width, cells[0] // width
+        game_map.flag_position = (cells[1] % width, cells[1] // width)
+        for cell in cells[2:]:
+            game_map.add_tank(game_map.tank_pool.acquire(
+                cell % width, cell // width,
+                rng.choice(("light", "medium", "heavy")),
+                game_map.enemy_pathfinder))
+        game_map.grid.load_passability(game_map.can_move_to)
+        game_map.flow_field.invalidate()
+        game_map.prepare_pathfinder()
+        game_map.blockers.load(game_map.terrain)
+        if game_map.projectile_store is not None:
+            game_map.projectile_store.load_terrain(game_map)
+    game_map.player.lives = 10 ** 9
+    return game_map
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+def run_scenario(name: str, seed: int = 0,
+                 ticks: Optional[int] = None) -> Dict:
+    """Замер одного сценария (лучше запускать в отдельном процессе,
+    чтобы пиковая память относилась только к нему)"""
+    scenario = BENCHMARK_SCENARIOS[name]
+    ticks = ticks or scenario["ticks"]
+    game_map = _build_scenario(scenario, seed)
+    bot = BotPlayer(random.Random(seed))
+    rng = random.Random(seed + 1)
+    directions = list(Direction)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    renderer = AnsiRenderer(devnull)
+
+    def step(tick: int) -> None:
+        current_time = tick * FRAME_TIME
+        game_map.handle_key(bot.choose_key(game_map), current_time)
+        for _ in range(scenario.get("storm", 0)):
+            game_map.add_projectile(game_map.projectile_pool.acquire(
+                rng.randrange(game_map.width), rng.randrange(game_map.height),
+                rng.choice(directions), 1, None))
+        game_map.update(current_time)
+
+    tick_times = []
+    render_times = []
+    pools = (game_map.projectile_pool, game_map.tank_pool)
+    created = sum(pool.created for pool in pools)
+    monitor = GcMonitor()
+    monitor.start()
+    try:
+        for tick in range(ticks):
+            started = time.perf_counter()
+            step(tick)
+            tick_times.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            renderer.render(game_map)
+            render_times.append(time.perf_counter() - started)
+    finally:
+        monitor.stop()
+    bytes_per_frame = renderer.bytes_written / max(1, renderer.frames)
+    peak_memory = None
+    if resource is not None:
+        # ru_maxrss в Linux - в килобайтах
+        peak_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    # Память, выделенная за тик вместе с отрисовкой: пик внутри тика
+    # над памятью в его начале. Ловит временные объекты, которые
+    # сразу становятся мусором, а не только промахи пулов
+    alloc_ticks = min(ticks, BENCHMARK_ALLOC_TICKS)
+    allocated = 0
+    tracemalloc.start()
+    try:
+        for tick in range(ticks, ticks + alloc_ticks):
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            step(tick)
+            renderer.render(game_map)
+            allocated += tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+        os.close(devnull)
+
+    total = sum(tick_times)
+    return {
+        "ticks": ticks,
+        "ticks_per_sec": ticks / total if total > 0 else 0.0,
+        "tick_mean_ms": total / ticks * 1000,
+        "tick_p50_ms": _percentile(tick_times, 0.5) * 1000,
+        "tick_p99_ms": _percentile(tick_times, 0.99) * 1000,
+        "render_p50_ms": _percentile(render_times, 0.5) * 1000,
+        "bytes_per_frame": bytes_per_frame,
+        "peak_memory_mb": peak_memory,
+        "alloc_bytes_per_tick": allocated / max(1, alloc_ticks),
+        # Объекты, созданные во время прогона, а не взятые из пулов
+        "pool_misses": sum(pool.created for pool in pools) - created,
+        "gc_collections": monitor.collections,
+        "gc_pause_ms": monitor.pause_time * 1000,
+        "gc_max_pause_ms": monitor.max_pause * 1000
+    }
+
+def run_benchmark(names: List[str], seed: int = 0,
+                  ticks: Optional[int] = None,
+                  repeats: int = BENCHMARK_REPEATS) -> Dict[str, Dict]:
+    """Прогон сценариев, каждый - repeats раз в новом процессе"""
+    results = {}
+    for name in names:
+        runs = []
+        for _ in range(repeats):
+            with ProcessPoolExecutor(max_workers=1) as pool:
+                runs.append(pool.submit(run_scenario, name, seed, ticks).result())
+        row = {}
+        for metric, value in runs[0].items():
+            values = [run[metric] for run in runs if run[metric] is not None]
+            if not values:
+                row[metric] = value
+            elif metric in BENCHMARK_METRICS:
+                row[metric] = min(values)
+            else:
+                row[metric] = _percentile(values, 0.5)
+        row["runs"] = repeats
+        results[name] = row
+    return results
+
+def compare_benchmark(results: Dict[str, Dict], baseline: Dict[str, Dict],
+                      threshold: float) -> List[str]:
+    """Регрессии относительно базового прогона: рост метрики больше
+    threshold процентов и больше ее порога шума"""
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric, noise in BENCHMARK_METRICS.items():
+            value, reference = metrics.get(metric), base.get(metric)
+            if value is None or reference is None:
+                continue
+            if value - reference <= noise:
+                continue
+            if reference == 0:
+                regressions.append(f"{name}: {metric} 0 -> {value:.3f}")
+                continue
+            change = (value - reference) / reference * 100
+            if change > threshold:
+                regressions.append(f"{name}: {metric} {reference:.3f} -> "
+                                   f"{value:.3f} ({change:+.1f}%)")
+    return regressions
+
+def print_benchmark(results: Dict[str, Dict]) -> None:
+    print(f"{'scenario':>20} {'ticks/s':>9} {'p50 ms':>8} {'p99 ms':>8} "
+          f"{'render ms':>9} {'bytes/frame':>11} {'peak MB':>8} "
+          f"{'alloc B/tick':>12} {'pool miss':>9} {'gc':>5} {'gc ms':>7}")
+    for name, row in results.items():
+        peak = row["peak_memory_mb"]
+        print(f"{name:>20} {row['ticks_per_sec']:>9.0f} {row['tick_p50_ms']:>8.2f} "
+              f"{row['tick_p99_ms']:>8.2f} {row['render_p50_ms']:>9.2f} "
+              f"{row['bytes_per_frame']:>11.1f} "
+              f"{peak if peak is not None else float('nan'):>8.1f} "
+              f"{row.get('alloc_bytes_per_tick', 0.0):>12.0f} "
+              f"{row.get('pool_misses', 0):>9} {row.get('gc_collections', 0):>5} "
+              f"{row.get('gc_pause_ms', 0.0):>7.2f}")
+
 class UserInterface:
     def __init__(self, screen):
         self.screen = screen
-        curses.init_pair(1, curses.COLOR_WHITE, curses.COLOR_BLACK)
-        curses.init_pair(2, curses.COLOR_RED, curses.COLOR_BLACK)
-        curses.init_pair(3, curses.COLOR_GREEN, curses.COLOR_BLACK)
-        curses.init_pair(4, curses.COLOR_YELLOW, curses.COLOR_BLACK)
-        curses.init_pair(5, curses.COLOR_BLUE, curses.COLOR_BLACK)
-        curses.init_pair(6, curses.COLOR_MAGENTA, curses.COLOR_BLACK)
-        curses.init_pair(7, curses.COLOR_CYAN, curses.COLOR_BLACK)
-        curses.init_pair(8, curses.COLOR_RED, curses.COLOR_BLACK)
+        for pair, color in PAIR_COLORS.items():
+            curses.init_pair(pair, color, curses.COLOR_BLACK)
 
     def show_main_menu(self) -> str:
         """Отображение главного меню"""
@@ -706,6 +2524,15 @@ class UserInterface:
         for i, info in enumerate(hud_info):
             self.screen.addstr(0, i * 20, info, curses.color_pair(1))
 
+    def show_profile_hud(self, line: str) -> None:
+        """Строка профилировщика внизу экрана"""
+        h, w = self.screen.getmaxyx()
+        try:
+            self.screen.addstr(h - 1, 0, line[:w - 1], curses.color_pair(4))
+            self.screen.clrtoeol()
+        except curses.error:
+            pass
+
     def show_pause_menu(self) -> str:
         """Отображение меню паузы"""
         pause_menu = [
@@ -763,7 +2590,10 @@ class UserInterface:
             if key in [ord('1'), ord('2')]:
                 return str(chr(key))
 
-def main(screen):
+def main(screen, tick_rate: float = FPS, render_rate: float = FPS,
+         record_path: Optional[str] = None, pathfinder: str = "flow",
+         path_workers: int = 0, profile_path: Optional[str] = None,
+         ai_budget_us: float = AI_BUDGET_US):
     """Основная функция игры"""
     curses.curs_set(0)  # Скрыть курсор
     screen.nodelay(1)  # Не блокировать ввод
@@ -774,6 +2604,14 @@ def main(screen):
     level = 1
     player = None
     game_map = None
+    recorder: Optional[ReplayRecorder] = None
+    loop: Optional[GameLoop] = None
+    # Реальные часы матча: на паузе останавливаются, поэтому после
+    # возврата в игру цикл не догоняет время, проведенное в меню
+    clock: Optional[SimClock] = None
+    # Профилировщик живет между матчами; 'f' включает и выключает его строку
+    profiler = FrameProfiler() if profile_path else None
+    show_profile = False
 
     while True:
         if game_state == "MENU":
@@ -794,33 +2632,101 @@ def main(screen):
             game_state = "START_GAME"
 
         elif game_state == "START_GAME":
-            game_map = GameMap(20, 10, level)
+            if recorder is not None:
+                recorder.close(loop.ticks)
+            if game_map is not None:
+                game_map.close()
+            game_map = GameMap(20, 10, level, ai_budget_us=ai_budget_us)
+            game_map.enemy_pathfinder = pathfinder
+            if path_workers and pathfinder != "flow":
+                game_map.enable_path_workers(path_workers)
             game_map.initialize_level()
+            game_map.profiler = profiler
+            if profiler is not None:
+                profiler.reset_frame()
+            renderer = DiffRenderer(screen, top=1)
             player = game_map.player
-            start_time = time.time()
+            clock = SimClock.real()
+            loop = GameLoop(tick_rate, render_rate, clock=clock.now)
+            if record_path:
+                # Записывается последний сыгранный матч
+                recorder = ReplayRecorder(record_path, level, game_map.seed,
+                                          loop.tick_time,
+                                          game_map.enemy_pathfinder,
+                                          ai_budget_us)
+            keys = []
+            current_time = 0.0
             game_state = "PLAYING"
 
         elif game_state == "PLAYING":
-            current_time = time.time() - start_time
-            ui.show_game_hud(player, level, game_map.killed_tanks, current_time)
-
-            game_map.update(current_time)
-            game_map.render(screen)
-
+            # Ввод читается без ожидания, темп задает игровой цикл.
+            # Клавиши копятся до ближайшего тика симуляции
+            screen.timeout(0)
+            if profiler is not None:
+                profiler.checkpoint()
             key = screen.getch()
-            if key == ord(' '):  # Выстрел
-                player.shoot(current_time)
-            elif key == curses.KEY_UP or key == curses.KEY_DOWN or key == curses.KEY_LEFT or key == curses.KEY_RIGHT:
-                player.update(game_map)
-            elif key == ord('p'):  # Пауза
+            while key != -1:
+                if key == ord('p'):  # Пауза
+                    break
+                if key == ord('f'):  # Строка профилировщика
+                    show_profile = not show_profile
+                    if show_profile and profiler is None:
+                        profiler = game_map.profiler = FrameProfiler()
+                    elif not show_profile and not profile_path:
+                        profiler = game_map.profiler = None
+                    screen.clear()
+                    renderer.invalidate()
+                else:
+                    keys.append(key)
+                key = screen.getch()
+            if profiler is not None:
+                profiler.mark("input")
+
+            if key == ord('p'):
+                screen.timeout(100)
+                clock.pause()
                 game_state = "PAUSED"
-
-            if player.lives <= 0:
+                continue
+
+            def step(sim_time: float) -> None:
+                for pressed in keys:
+                    if recorder is not None:
+                        recorder.record(loop.ticks, pressed)
+                    game_map.handle_key(pressed, sim_time)
+                keys.clear()
+                game_map.update(sim_time)
+
+            def render() -> None:
+                if profiler is not None:
+                    profiler.checkpoint()
+                ui.show_game_hud(player, level, game_map.killed_tanks,
+                                 loop.sim_time)
+                if profiler is not None:
+                    profiler.mark("hud")
+                renderer.render(game_map)
+                if show_profile:
+                    ui.show_profile_hud(profiler.hud_line(game_map))
+
+            loop.run_frame(step, render)
+            if profiler is not None:
+                profiler.end_frame()
+            current_time = loop.sim_time
+
+            if player.lives <= 0 or game_map.game_state != GameState.PLAYING:
+                screen.timeout(100)
+                if recorder is not None:
+                    recorder.close(loop.ticks)
                 game_state = "GAME_OVER"
 
         elif game_state == "PAUSED":
             choice = ui.show_pause_menu()
             if choice == '1':
+                # Меню паузы очистило экран - нужен полный кадр
+                screen.clear()
+                renderer.invalidate()
+                clock.resume()
+                if profiler is not None:
+                    profiler.reset_frame()
                 game_state = "PLAYING"
             elif choice == '2':
                 level = 1
@@ -842,5 +2748,167 @@ def main(screen):
             elif choice == '2':
                 game_state = "MENU"
 
+    if recorder is not None:
+        recorder.close(loop.ticks)
+    if game_map is not None:
+        game_map.close()
+    if profile_path:
+        profiler.dump(profile_path)
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=GAME_TITLE)
+    parser.add_argument("--headless", action="store_true",
+                        help="запуск симуляции без терминала")
+    parser.add_argument("--level", type=int, default=1,
+                        help="номер уровня для режима без терминала")
+    parser.add_argument("--ticks", type=int, default=10000,
+                        help="максимальное число тиков симуляции")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="зерно генератора случайных чисел")
+    parser.add_argument("--pathfinder", choices=["flow", "astar", "jps", "hpa"],
+                        default="flow", help="алгоритм поиска пути противников")
+    parser.add_argument("--ai-budget", type=float, default=AI_BUDGET_US,
+                        metavar="US",
+                        help="бюджет пересчета путей противников за тик, мкс")
+    parser.add_argument("--numpy-projectiles", action="store_true",
+                        help="векторный движок снарядов на NumPy")
+    parser.add_argument("--time-scale", type=float, default=None,
+                        help="режим без терминала по ускоренным реальным часам "
+                             "(по умолчанию - виртуальное время)")
+    parser.add_argument("--record", metavar="FILE",
+                        help="записать ввод матча в файл")
+    parser.add_argument("--replay", metavar="FILE",
+                        help="повторить записанный матч")
+    parser.add_argument("--replay-speed", type=float, default=None,
+                        help="скорость повтора относительно реального времени "
+                             "(по умолчанию - максимальная)")
+    parser.add_argument("--batch", type=int, metavar="N",
+                        help="пакетный прогон: N матчей на каждое сочетание "
+                             "уровня и интервала появления")
+    parser.add_argument("--levels", type=int, nargs="+",
+                        help="уровни для пакетного прогона (по умолчанию --level)")
+    parser.add_argument("--spawn-interval", type=float, nargs="+",
+                        help="интервалы появления танков для пакетного прогона")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="число процессов (по умолчанию - число ядер)")
+    parser.add_argument("--output", metavar="FILE",
+                        help="файл результатов пакетного прогона (.csv или .json)")
+    parser.add_argument("--path-workers", type=int, default=0,
+                        help="число процессов для поиска пути astar/jps/hpa "
+                             "(0 - в главном цикле; матч перестает быть "
+                             "детерминированным)")
+    parser.add_argument("--benchmark", nargs="*", metavar="SCENARIO",
+                        help="замер производительности по сценариям "
+                             "(без имен - все): " + ", ".join(BENCHMARK_SCENARIOS))
+    parser.add_argument("--benchmark-ticks", type=int, default=None,
+                        help="число тиков каждого сценария (по умолчанию - свое)")
+    parser.add_argument("--benchmark-save", metavar="FILE",
+                        help="сохранить результаты замера в JSON")
+    parser.add_argument("--benchmark-baseline", metavar="FILE",
+                        help="сравнить с сохраненным замером")
+    parser.add_argument("--benchmark-threshold", type=float, default=10.0,
+                        help="допустимое ухудшение метрики, %%")
+    parser.add_argument("--benchmark-repeats", type=int, default=BENCHMARK_REPEATS,
+                        help="сколько раз прогонять каждый сценарий "
+                             "(сравнивается лучший прогон)")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="замерять фазы кадра и сохранить гистограмму в JSON "
+                             "(в игре строку профилировщика включает 'f')")
+    parser.add_argument("--tick-rate", type=float, default=FPS,
+                        help="частота шагов симуляции, Гц")
+    parser.add_argument("--render-rate", type=float, default=FPS,
+                        help="частота отрисовки, Гц")
+    parser.add_argument("--ansi", action="store_true",
+                        help="вывод кадров в stdout ANSI-последовательностями "
+                             "(для режима без терминала)")
+    return parser.parse_args(argv)
+
+def print_stats(stats: Dict) -> None:
+    for key, value in stats.items():
+        if isinstance(value, float):
+            value = f"{value:.3f}"
+        print(f"{key}: {value}")
+
 if __name__ == "__main__":
-    curses.wrapper(main)
\ No newline at end of file
+    args = parse_args()
+    if args.numpy_projectiles and np is None:
+        sys.exit("--numpy-projectiles: NumPy не установлен")
+    if args.benchmark is not None:
+        names = args.benchmark or list(BENCHMARK_SCENARIOS)
+        unknown = [name for name in names if name not in BENCHMARK_SCENARIOS]
+        if unknown:
+            sys.exit(f"неизвестные сценарии: {', '.join(unknown)}")
+        if np is None:
+            names = [name for name in names
+                     if not BENCHMARK_SCENARIOS[name].get("numpy")]
+        results = run_benchmark(names, args.seed, args.benchmark_ticks,
+                                max(1, args.benchmark_repeats))
+        print_benchmark(results)
+        if args.benchmark_save:
+            with open(args.benchmark_save, "w", encoding="utf-8") as file:
+                json.dump({"python": sys.version.split()[0],
+                           "scenarios": results}, file, indent=2)
+        if args.benchmark_baseline:
+            with open(args.benchmark_baseline, encoding="utf-8") as file:
+                baseline = json.load(file)["scenarios"]
+            regressions = compare_benchmark(results, baseline,
+                                            args.benchmark_threshold)
+            for line in regressions:
+                print(f"REGRESSION {line}")
+            if regressions:
+                sys.exit(1)
+    elif args.batch:
+        started = time.perf_counter()
+        results = run_batch(args.levels or [args.level], args.batch,
+                            seed=args.seed, ticks=args.ticks,
+                            workers=args.workers, pathfinder=args.pathfinder,
+                            spawn_intervals=args.spawn_interval,
+                            numpy_projectiles=args.numpy_projectiles,
+                            ai_budget_us=args.ai_budget)
+        elapsed = time.perf_counter() - started
+        summary = summarize_batch(results)
+        if args.output:
+            write_batch(args.output, results, summary)
+        for row in summary:
+            print_stats(row)
+            print()
+        total_ticks = sum(stats["ticks"] for stats in results)
+        print(f"matches: {len(results)} wall_time: {elapsed:.3f} "
+              f"ticks_per_sec: {total_ticks / elapsed:.0f}")
+    elif args.headless or args.replay:
+        renderer = AnsiRenderer(sys.stdout.fileno()) if args.ansi else None
+        if args.replay:
+            stats = run_replay(Replay.load(args.replay), renderer=renderer,
+                               speed=args.replay_speed,
+                               numpy_projectiles=args.numpy_projectiles)
+        else:
+            clock = SimClock.scaled(args.time_scale) if args.time_scale else None
+            recorder = None
+            profiler = FrameProfiler() if args.profile else None
+            if args.record:
+                recorder = ReplayRecorder(args.record, args.level, args.seed,
+                                          FRAME_TIME, args.pathfinder,
+                                          args.ai_budget)
+            stats = run_headless(args.level, args.ticks, args.seed,
+                                 renderer=renderer,
+                                 clock=clock,
+                                 recorder=recorder,
+                                 path_workers=args.path_workers,
+                                 profiler=profiler,
+                                 pathfinder=args.pathfinder,
+                                 numpy_projectiles=args.numpy_projectiles,
+                                 ai_budget_us=args.ai_budget)
+            if profiler is not None:
+                profiler.dump(args.profile)
+        if renderer is not None:
+            renderer.close()
+            frames = max(1, renderer.frames)
+            stats.update({
+                'bytes_per_frame': renderer.bytes_written / frames,
+                'writes_per_frame': renderer.writes / frames
+            })
+        print_stats(stats)
+    else:
+        curses.wrapper(main, args.tick_rate, args.render_rate, args.record,
+                       args.pathfinder, args.path_workers, args.profile,
+                       args.ai_budget)
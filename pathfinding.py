@@ -0,0 +1,1153 @@
+import heapq
+import random
+import struct
+import sys
+import time
+from array import array
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# Значение расстояния для недостижимых клеток
+UNREACHABLE = -1
+
+# Смещения соседних клеток (4-связная сетка)
+NEIGHBOR_OFFSETS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+
+# Снимки сравниваются блоками такого размера, внутри отличающихся блоков -
+# поклеточно
+SNAPSHOT_CHUNK = 4096
+
+# Размер кластера иерархического поиска (HPA*)
+HPA_CLUSTER_SIZE = 10
+# Проходы длиннее этого получают два перехода по краям вместо одного
+HPA_LONG_ENTRANCE = 6
+# Сколько деревьев путей к целям хранится одновременно
+HPA_GOAL_TREES = 4
+
+# Клеточная карта проходимости с плоскими индексами клеток
+class GridGraph:
+    def __init__(self, width: int, height: int):
+        self.width = width
+        self.height = height
+        self.size = width * height
+        self.passable = bytearray(self.size)
+        # Таблица проходимых соседей, строится лениво
+        self._neighbors: Optional[List[Tuple[int, ...]]] = None
+        # Рабочие массивы поиска переиспользуются между запросами:
+        # клетка считается посещенной, только если ее метка равна номеру поиска
+        self._search_id = 0
+        self._seen = array('I', [0]) * self.size
+        self._closed = array('I', [0]) * self.size
+        self._cost = array('i', [0]) * self.size
+        self._parent = array('i', [-1]) * self.size
+        self._jump_table: Optional['JumpTable'] = None
+        self._hierarchy: Optional['ClusterGraph'] = None
+        self.expansions = 0
+
+    def in_bounds(self, x: int, y: int) -> bool:
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def index(self, x: int, y: int) -> int:
+        return y * self.width + x
+
+    def position(self, index: int) -> Tuple[int, int]:
+        return (index % self.width, index // self.width)
+
+    def load_passability(self, can_move_to: Callable[[int, int], bool]) -> None:
+        """Загрузка проходимости клеток из карты"""
+        width = self.width
+        for y in range(self.height):
+            for x in range(width):
+                self.passable[y * width + x] = 1 if can_move_to(x, y) else 0
+        self._neighbors = None
+        self._jump_table = None
+        self._hierarchy = None
+
+    def load_snapshot(self, passable: bytes) -> None:
+        """Загрузка проходимости из готового массива байтов"""
+        self.passable[:] = passable
+        self._neighbors = None
+        self._jump_table = None
+        self._hierarchy = None
+
+    def apply_snapshot(self, passable: bytes) -> int:
+        """Переход к новому снимку проходимости: отличающиеся клетки
+        меняются через set_passable, поэтому таблицы не строятся заново.
+        При большом числе отличий снимок загружается целиком.
+        Возвращает число изменившихся клеток"""
+        current, size, width = self.passable, self.size, self.width
+        changed = []
+        for start in range(0, size, SNAPSHOT_CHUNK):
+            end = min(start + SNAPSHOT_CHUNK, size)
+            if current[start:end] != passable[start:end]:
+                changed.extend(index for index in range(start, end)
+                               if current[index] != passable[index])
+        if len(changed) > size // 8:
+            self.load_snapshot(passable)
+        else:
+            for index in changed:
+                self.set_passable(index % width, index // width,
+                                  bool(passable[index]))
+        return len(changed)
+
+    def set_passable(self, x: int, y: int, passable: bool) -> bool:
+        """Смена проходимости клетки, возвращает True при изменении"""
+        index = y * self.width + x
+        value = 1 if passable else 0
+        if self.passable[index] == value:
+            return False
+        self.passable[index] = value
+        if self._jump_table is not None:
+            self._jump_table.update_cell(x, y)
+        if self._hierarchy is not None:
+            self._hierarchy.mark_dirty(x, y)
+
+        # Пересчитываются только записи самой клетки и ее соседей
+        if self._neighbors is not None:
+            self._neighbors[index] = self._collect_neighbors(index)
+            for dx, dy in NEIGHBOR_OFFSETS:
+                nx, ny = x + dx, y + dy
+                if self.in_bounds(nx, ny):
+                    neighbor = ny * self.width + nx
+                    self._neighbors[neighbor] = self._collect_neighbors(neighbor)
+        return True
+
+    def _collect_neighbors(self, index: int) -> Tuple[int, ...]:
+        width, height = self.width, self.height
+        x, y = index % width, index // width
+        passable = self.passable
+        neighbors = []
+        for dx, dy in NEIGHBOR_OFFSETS:
+            nx, ny = x + dx, y + dy
+            if 0 <= nx < width and 0 <= ny < height:
+                neighbor = ny * width + nx
+                if passable[neighbor]:
+                    neighbors.append(neighbor)
+        return tuple(neighbors)
+
+    def get_neighbor_table(self) -> List[Tuple[int, ...]]:
+        """Таблица проходимых соседей для каждой клетки"""
+        if self._neighbors is None:
+            self._neighbors = [self._collect_neighbors(index)
+                               for index in range(self.size)]
+        return self._neighbors
+
+    def get_jump_table(self) -> 'JumpTable':
+        """Предрасчитанные прыжки для Jump Point Search"""
+        if self._jump_table is None:
+            self._jump_table = JumpTable(self)
+        return self._jump_table
+
+    def get_hierarchy(self, cluster_size: int = HPA_CLUSTER_SIZE) -> 'ClusterGraph':
+        """Абстрактный граф кластеров для HPA*"""
+        if self._hierarchy is None or self._hierarchy.cluster_size != cluster_size:
+            self._hierarchy = ClusterGraph(self, cluster_size)
+        return self._hierarchy
+
+    def next_search_id(self) -> int:
+        self._search_id += 1
+        return self._search_id
+
+def a_star(graph: GridGraph, start: Tuple[int, int],
+           goal: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """Поиск кратчайшего пути A* (пустой список, если пути нет)
+
+    Путь включает стартовую и целевую клетки.
+    """
+    if not graph.in_bounds(*start) or not graph.in_bounds(*goal):
+        return []
+    if start == goal:
+        return [start]
+
+    width = graph.width
+    start_index = graph.index(*start)
+    goal_index = graph.index(*goal)
+    if not graph.passable[goal_index]:
+        return []
+
+    neighbors = graph.get_neighbor_table()
+    search_id = graph.next_search_id()
+    seen, closed = graph._seen, graph._closed
+    cost, parent = graph._cost, graph._parent
+    gx, gy = goal
+
+    seen[start_index] = search_id
+    cost[start_index] = 0
+    parent[start_index] = -1
+    # При равной оценке первыми раскрываются более глубокие узлы
+    frontier = [(abs(start[0] - gx) + abs(start[1] - gy), 0, start_index)]
+    expansions = 0
+    found = False
+
+    while frontier:
+        _, negative_cost, current = heapq.heappop(frontier)
+        if closed[current] == search_id:
+            continue
+        closed[current] = search_id
+        expansions += 1
+
+        if current == goal_index:
+            found = True
+            break
+
+        new_cost = 1 - negative_cost
+        for neighbor in neighbors[current]:
+            if closed[neighbor] == search_id:
+                continue
+            if seen[neighbor] != search_id or new_cost < cost[neighbor]:
+                seen[neighbor] = search_id
+                cost[neighbor] = new_cost
+                parent[neighbor] = current
+                priority = (new_cost + abs(neighbor % width - gx) +
+                            abs(neighbor // width - gy))
+                heapq.heappush(frontier, (priority, -new_cost, neighbor))
+
+    graph.expansions += expansions
+    if not found:
+        return []
+    return _reconstruct_path(graph, start_index, goal_index)
+
+def _reconstruct_path(graph: GridGraph, start_index: int,
+                      goal_index: int) -> List[Tuple[int, int]]:
+    path = []
+    current = goal_index
+    parent = graph._parent
+    while current != start_index:
+        path.append(graph.position(current))
+        current = parent[current]
+    path.append(graph.position(start_index))
+    path.reverse()
+    return path
+
+# Предрасчет прыжков JPS (в духе JPS+): для каждой клетки и направления
+# хранится ближайшая точка прыжка, не зависящая от цели поиска
+class JumpTable:
+    def __init__(self, graph: GridGraph):
+        self.graph = graph
+        size = graph.size
+        # Номера непрерывных проходимых отрезков строк и столбцов
+        self.row_segment = array('i', [-1]) * size
+        self.col_segment = array('i', [-1]) * size
+        self.segments = 0
+        # Ближайшие точки прыжка по каждому направлению
+        self.right = array('i', [-1]) * size
+        self.left = array('i', [-1]) * size
+        self.down = array('i', [-1]) * size
+        self.up = array('i', [-1]) * size
+        # Вертикальные прыжки зависят от горизонтальных, поэтому
+        # сначала строятся все строки, затем все столбцы
+        for y in range(graph.height):
+            self._build_row(y)
+        for x in range(graph.width):
+            self._build_column(x)
+
+    def update_cell(self, x: int, y: int) -> None:
+        """Пересчет таблицы после смены проходимости клетки (x, y)
+
+        Горизонтальные прыжки зависят только от своей строки и соседних,
+        поэтому перестраиваются строки y-1..y+1. Столбцы перестраиваются
+        соседние с клеткой и те, где изменились горизонтальные прыжки.
+        """
+        graph = self.graph
+        columns = {column for column in (x - 1, x, x + 1)
+                   if 0 <= column < graph.width}
+        for row in (y - 1, y, y + 1):
+            if 0 <= row < graph.height:
+                columns.update(self._build_row(row))
+        for column in sorted(columns):
+            self._build_column(column)
+
+    def _build_row(self, y: int) -> Set[int]:
+        """Отрезки и горизонтальные прыжки строки y.
+        Возвращает столбцы, в которых изменились прыжки"""
+        graph = self.graph
+        width, height = graph.width, graph.height
+        passable = graph.passable
+        start = y * width
+
+        def is_open(x: int, y: int) -> bool:
+            return 0 <= x < width and 0 <= y < height and passable[y * width + x]
+
+        row_segment = self.row_segment
+        previous_open = False
+        for index in range(start, start + width):
+            if passable[index]:
+                if not previous_open:
+                    self.segments += 1
+                row_segment[index] = self.segments
+                previous_open = True
+            else:
+                row_segment[index] = -1
+                previous_open = False
+
+        # Ближайшая горизонтальная точка прыжка (клетка с вынужденным соседом)
+        changed = set()
+        for dx, table in ((1, self.right), (-1, self.left)):
+            nearest = -1
+            xs = range(width - 1, -1, -1) if dx > 0 else range(width)
+            for x in xs:
+                index = start + x
+                if not passable[index]:
+                    value = -1
+                    nearest = -1
+                else:
+                    value = nearest
+                    if ((is_open(x, y - 1) and not is_open(x - dx, y - 1)) or
+                            (is_open(x, y + 1) and not is_open(x - dx, y + 1))):
+                        nearest = index
+                if table[index] != value:
+                    table[index] = value
+                    changed.add(x)
+        return changed
+
+    def _build_column(self, x: int) -> None:
+        """Отрезки и вертикальные прыжки столбца x"""
+        graph = self.graph
+        width, height = graph.width, graph.height
+        passable = graph.passable
+
+        def is_open(x: int, y: int) -> bool:
+            return 0 <= x < width and 0 <= y < height and passable[y * width + x]
+
+        col_segment = self.col_segment
+        previous_open = False
+        for index in range(x, graph.size, width):
+            if passable[index]:
+                if not previous_open:
+                    self.segments += 1
+                col_segment[index] = self.segments
+                previous_open = True
+            else:
+                col_segment[index] = -1
+                previous_open = False
+
+        # Ближайшая вертикальная точка прыжка: вынужденный сосед сбоку
+        # или горизонтальный прыжок, который из нее что-то находит
+        right, left = self.right, self.left
+        for dy, table in ((1, self.down), (-1, self.up)):
+            nearest = -1
+            ys = range(height - 1, -1, -1) if dy > 0 else range(height)
+            for y in ys:
+                index = y * width + x
+                if not passable[index]:
+                    table[index] = -1
+                    nearest = -1
+                    continue
+                table[index] = nearest
+                if ((is_open(x - 1, y) and not is_open(x - 1, y - dy)) or
+                        (is_open(x + 1, y) and not is_open(x + 1, y - dy)) or
+                        right[index] >= 0 or left[index] >= 0):
+                    nearest = index
+
+def jump_point_search(graph: GridGraph, start: Tuple[int, int],
+                      goal: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """Jump Point Search для 4-связной сетки с единичной ценой шага
+
+    Возвращает путь той же длины, что и a_star, но раскрывает только
+    точки прыжка: горизонтальные прыжки останавливаются на вынужденных
+    соседях, а вертикальные на каждом шаге пробуют горизонтальный прыжок.
+
+    Горизонтальные и вертикальные прыжки берутся из таблицы JumpTable,
+    поэтому каждый прыжок стоит O(1) независимо от его длины.
+    """
+    if not graph.in_bounds(*start) or not graph.in_bounds(*goal):
+        return []
+    if start == goal:
+        return [start]
+
+    width, height = graph.width, graph.height
+    passable = graph.passable
+    start_index = graph.index(*start)
+    goal_index = graph.index(*goal)
+    if not passable[goal_index]:
+        return []
+
+    gx, gy = goal
+
+    def is_open(x: int, y: int) -> bool:
+        return 0 <= x < width and 0 <= y < height and passable[y * width + x]
+
+    jumps = graph.get_jump_table()
+    row_segment, col_segment = jumps.row_segment, jumps.col_segment
+    goal_row_segment = row_segment[goal_index]
+
+    def jump_horizontal(x: int, y: int, dx: int) -> int:
+        index = y * width + x
+        jump_point = (jumps.right if dx > 0 else jumps.left)[index]
+        # Цель на том же отрезке строки ближе предрасчитанной точки прыжка
+        if (y == gy and (gx - x) * dx > 0 and
+                row_segment[index] == goal_row_segment and
+                (jump_point < 0 or abs(gx - x) <= abs(jump_point % width - x))):
+            return goal_index
+        return jump_point
+
+    def jump_vertical(x: int, y: int, dy: int) -> int:
+        index = y * width + x
+        jump_point = (jumps.down if dy > 0 else jumps.up)[index]
+        best = abs(jump_point // width - y) if jump_point >= 0 else height
+        if (gy - y) * dy > 0 and abs(gy - y) <= best:
+            # Из клетки строки цели горизонтальный прыжок находит цель
+            turn = gy * width + x
+            if (col_segment[turn] == col_segment[index] and
+                    row_segment[turn] == goal_row_segment):
+                return turn
+        return jump_point
+
+    def successor_directions(x: int, y: int, dx: int, dy: int) -> List[Tuple[int, int]]:
+        if dx == 0 and dy == 0:
+            return NEIGHBOR_OFFSETS
+        if dy != 0:
+            # Вертикальное движение: вперед и в обе стороны
+            return [(0, dy), (1, 0), (-1, 0)]
+        directions = [(dx, 0)]
+        # Горизонтальное движение: вперед и к вынужденным соседям
+        for side in (-1, 1):
+            if is_open(x, y + side) and not is_open(x - dx, y + side):
+                directions.append((0, side))
+        return directions
+
+    search_id = graph.next_search_id()
+    seen, closed = graph._seen, graph._closed
+    cost, parent = graph._cost, graph._parent
+
+    seen[start_index] = search_id
+    cost[start_index] = 0
+    parent[start_index] = -1
+    frontier = [(abs(start[0] - gx) + abs(start[1] - gy), 0, start_index)]
+    expansions = 0
+    found = False
+
+    while frontier:
+        _, negative_cost, current = heapq.heappop(frontier)
+        if closed[current] == search_id:
+            continue
+        closed[current] = search_id
+        expansions += 1
+
+        if current == goal_index:
+            found = True
+            break
+
+        cx, cy = current % width, current // width
+        current_cost = -negative_cost
+        dx = dy = 0
+        if parent[current] >= 0:
+            px, py = parent[current] % width, parent[current] // width
+            dx = (cx > px) - (cx < px)
+            dy = (cy > py) - (cy < py)
+
+        for step_x, step_y in successor_directions(cx, cy, dx, dy):
+            if current == start_index and not passable[start_index]:
+                # Старт внутри препятствия: таблица прыжков для него не
+                # построена, поэтому делается обычный шаг к соседу
+                nx, ny = cx + step_x, cy + step_y
+                jump_point = ny * width + nx if is_open(nx, ny) else -1
+            elif step_y == 0:
+                jump_point = jump_horizontal(cx, cy, step_x)
+            else:
+                jump_point = jump_vertical(cx, cy, step_y)
+            if jump_point < 0 or closed[jump_point] == search_id:
+                continue
+
+            jx, jy = jump_point % width, jump_point // width
+            new_cost = current_cost + abs(jx - cx) + abs(jy - cy)
+            if seen[jump_point] != search_id or new_cost < cost[jump_point]:
+                seen[jump_point] = search_id
+                cost[jump_point] = new_cost
+                parent[jump_point] = current
+                priority = new_cost + abs(jx - gx) + abs(jy - gy)
+                heapq.heappush(frontier, (priority, -new_cost, jump_point))
+
+    graph.expansions += expansions
+    if not found:
+        return []
+
+    # Восстановление полного пути между точками прыжка
+    jump_points = _reconstruct_path(graph, start_index, goal_index)
+    path = [jump_points[0]]
+    for x, y in jump_points[1:]:
+        px, py = path[-1]
+        step_x = (x > px) - (x < px)
+        step_y = (y > py) - (y < py)
+        while (px, py) != (x, y):
+            px += step_x
+            py += step_y
+            path.append((px, py))
+    return path
+
+# Абстрактный граф HPA*: карта разбита на кластеры фиксированного размера,
+# узлы - клетки переходов на границах кластеров, ребра - переходы между
+# соседними кластерами и кратчайшие пути внутри кластера
+class ClusterGraph:
+    def __init__(self, graph: GridGraph, cluster_size: int = HPA_CLUSTER_SIZE):
+        self.graph = graph
+        self.cluster_size = cluster_size
+        self.clusters_x = (graph.width + cluster_size - 1) // cluster_size
+        self.clusters_y = (graph.height + cluster_size - 1) // cluster_size
+        # Переходы на каждой границе: пары соседних клеток по разные стороны
+        self.transitions: Dict[Tuple[str, int, int], List[Tuple[int, int]]] = {}
+        self.cluster_nodes: Dict[Tuple[int, int], Set[int]] = {}
+        self.edges: Dict[int, Dict[int, int]] = {}
+        # Кэш уточненных путей внутри кластеров
+        self.segment_cache: Dict[Tuple[int, int], List[int]] = {}
+        self.dirty_clusters: Set[Tuple[int, int]] = set()
+        # Деревья путей к часто запрашиваемым целям
+        self.goal_trees: Dict[int, Tuple[Dict[int, int], Dict[int, int]]] = {}
+        self.goal_requests: Dict[int, int] = {}
+        self.rebuilds = 0
+        # Номер связной области клетки внутри ее кластера
+        self.component = array('i', [-1]) * graph.size
+        self._next_component = 0
+
+        for cy in range(self.clusters_y):
+            for cx in range(self.clusters_x):
+                self._label_components((cx, cy))
+        for cy in range(self.clusters_y):
+            for cx in range(self.clusters_x):
+                self._build_border_transitions(cx, cy)
+        self._rebuild_clusters({(cx, cy) for cy in range(self.clusters_y)
+                                for cx in range(self.clusters_x)})
+
+    def cluster_of(self, index: int) -> Tuple[int, int]:
+        width = self.graph.width
+        return (index % width // self.cluster_size,
+                index // width // self.cluster_size)
+
+    def _cluster_bounds(self, cluster: Tuple[int, int]) -> Tuple[int, int, int, int]:
+        size = self.cluster_size
+        x0, y0 = cluster[0] * size, cluster[1] * size
+        return (x0, y0, min(x0 + size, self.graph.width),
+                min(y0 + size, self.graph.height))
+
+    def _label_components(self, cluster: Tuple[int, int]) -> None:
+        """Разметка связных областей кластера"""
+        graph = self.graph
+        width, passable = graph.width, graph.passable
+        component = self.component
+        x0, y0, x1, y1 = self._cluster_bounds(cluster)
+        for y in range(y0, y1):
+            for x in range(x0, x1):
+                component[y * width + x] = -1
+        for y in range(y0, y1):
+            for x in range(x0, x1):
+                index = y * width + x
+                if passable[index] and component[index] < 0:
+                    self._next_component += 1
+                    distance, _ = self._cluster_bfs(cluster, index)
+                    for cell in distance:
+                        component[cell] = self._next_component
+
+    def _build_border_transitions(self, cx: int, cy: int) -> None:
+        """Поиск переходов на правой и нижней границах кластера"""
+        graph = self.graph
+        width, passable = graph.width, graph.passable
+        x0, y0, x1, y1 = self._cluster_bounds((cx, cy))
+
+        if cx + 1 < self.clusters_x:
+            pairs = [(y * width + x1 - 1, y * width + x1) for y in range(y0, y1)]
+            self.transitions[('v', cx, cy)] = self._entrances(pairs)
+        if cy + 1 < self.clusters_y:
+            pairs = [((y1 - 1) * width + x, y1 * width + x) for x in range(x0, x1)]
+            self.transitions[('h', cx, cy)] = self._entrances(pairs)
+
+    def _entrances(self, pairs: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        # Непрерывные участки границы, проходимые с обеих сторон. Участок,
+        # соединяющий уже связанные этой границей области, не нужен
+        passable, component = self.graph.passable, self.component
+        result = []
+        connected = set()
+        run: List[Tuple[int, int]] = []
+        for pair in pairs + [(-1, -1)]:
+            if pair[0] >= 0 and passable[pair[0]] and passable[pair[1]]:
+                run.append(pair)
+                continue
+            if run:
+                a, b = run[0]
+                areas = (component[a], component[b])
+                if len(run) >= HPA_LONG_ENTRANCE:
+                    result.extend([run[0], run[-1]])
+                elif areas not in connected:
+                    result.append(run[len(run) // 2])
+                connected.add(areas)
+                run = []
+        return result
+
+    def _cluster_borders(self, cluster: Tuple[int, int]) -> List[Tuple[str, int, int]]:
+        cx, cy = cluster
+        keys = [('v', cx, cy), ('h', cx, cy), ('v', cx - 1, cy), ('h', cx, cy - 1)]
+        return [key for key in keys if key in self.transitions]
+
+    def _neighbor_clusters(self, cluster: Tuple[int, int]) -> List[Tuple[int, int]]:
+        cx, cy = cluster
+        result = []
+        for dx, dy in NEIGHBOR_OFFSETS:
+            nx, ny = cx + dx, cy + dy
+            if 0 <= nx < self.clusters_x and 0 <= ny < self.clusters_y:
+                result.append((nx, ny))
+        return result
+
+    def mark_dirty(self, x: int, y: int) -> None:
+        """Клетка сменила проходимость: кластер будет перестроен при запросе"""
+        self.dirty_clusters.add(self.cluster_of(self.graph.index(x, y)))
+
+    def _apply_dirty(self) -> None:
+        if not self.dirty_clusters:
+            return
+        dirty = self.dirty_clusters
+        self.dirty_clusters = set()
+
+        # Переходы меняются только на границах измененных кластеров,
+        # а набор узлов - еще и у их соседей
+        for cluster in dirty:
+            self._label_components(cluster)
+        for cluster in dirty:
+            for kind, cx, cy in self._cluster_borders(cluster):
+                self._build_border_transitions(cx, cy)
+        affected = set(dirty)
+        for cluster in dirty:
+            affected.update(self._neighbor_clusters(cluster))
+        self._rebuild_clusters(affected)
+        self.rebuilds += 1
+
+    def _rebuild_clusters(self, clusters: Set[Tuple[int, int]]) -> None:
+        edges = self.edges
+        for cluster in clusters:
+            for node in self.cluster_nodes.pop(cluster, ()):
+                for neighbor in edges.pop(node, {}):
+                    if neighbor in edges:
+                        edges[neighbor].pop(node, None)
+
+        # Узлы кластеров и ребра переходов между кластерами
+        for cluster in clusters:
+            self.cluster_nodes[cluster] = set()
+        borders = set()
+        for cluster in clusters:
+            borders.update(self._cluster_borders(cluster))
+        for key in borders:
+            for a, b in self.transitions[key]:
+                for node in (a, b):
+                    owner = self.cluster_of(node)
+                    if owner in clusters:
+                        self.cluster_nodes[owner].add(node)
+                    edges.setdefault(node, {})
+                edges[a][b] = 1
+                edges[b][a] = 1
+
+        # Ребра внутри кластеров: поиск в ширину от каждого узла
+        for cluster in clusters:
+            nodes = self.cluster_nodes[cluster]
+            for node in nodes:
+                distance, _ = self._cluster_bfs(cluster, node)
+                for other in nodes:
+                    if other != node and other in distance:
+                        edges[node][other] = distance[other]
+
+        self.segment_cache = {key: path for key, path in self.segment_cache.items()
+                              if self.cluster_of(key[0]) not in clusters}
+        self.goal_trees.clear()
+
+    def _cluster_bfs(self, cluster: Tuple[int, int], source: int,
+                     target: int = -1) -> Tuple[Dict[int, int], Dict[int, int]]:
+        """Поиск в ширину, не выходящий за границы кластера"""
+        graph = self.graph
+        width = graph.width
+        neighbors = graph.get_neighbor_table()
+        x0, y0, x1, y1 = self._cluster_bounds(cluster)
+        distance = {source: 0}
+        parent = {source: -1}
+        frontier = deque([source])
+        # Клетки поиска внутри кластеров - основная работа HPA*,
+        # поэтому они входят в счетчик раскрытий графа
+        expansions = 0
+        while frontier:
+            current = frontier.popleft()
+            expansions += 1
+            if current == target:
+                break
+            next_distance = distance[current] + 1
+            for neighbor in neighbors[current]:
+                if neighbor in distance:
+                    continue
+                nx, ny = neighbor % width, neighbor // width
+                if x0 <= nx < x1 and y0 <= ny < y1:
+                    distance[neighbor] = next_distance
+                    parent[neighbor] = current
+                    frontier.append(neighbor)
+        graph.expansions += expansions
+        return distance, parent
+
+    def _segment(self, a: int, b: int) -> List[int]:
+        """Клетки пути от a до b внутри общего кластера (без клетки a)"""
+        key = (a, b)
+        if key not in self.segment_cache:
+            _, parent = self._cluster_bfs(self.cluster_of(a), a, b)
+            cells = []
+            current = b
+            while current != a:
+                cells.append(current)
+                current = parent[current]
+            cells.reverse()
+            self.segment_cache[key] = cells
+        return self.segment_cache[key]
+
+    def _link(self, index: int) -> Dict[int, int]:
+        # Временные ребра от клетки к узлам ее кластера
+        cluster = self.cluster_of(index)
+        distance, _ = self._cluster_bfs(cluster, index)
+        return {node: distance[node] for node in self.cluster_nodes[cluster]
+                if node in distance and node != index}
+
+    def find_path(self, start: Tuple[int, int],
+                  goal: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """Поиск маршрута по абстрактному графу с уточнением до клеток"""
+        graph = self.graph
+        if not graph.in_bounds(*start) or not graph.in_bounds(*goal):
+            return []
+        if start == goal:
+            return [start]
+        start_index = graph.index(*start)
+        goal_index = graph.index(*goal)
+        if not graph.passable[goal_index]:
+            return []
+        self._apply_dirty()
+
+        start_links = self._link(start_index)
+        if self.cluster_of(start_index) == self.cluster_of(goal_index):
+            distance, _ = self._cluster_bfs(self.cluster_of(start_index),
+                                            start_index, goal_index)
+            if goal_index in distance:
+                start_links[goal_index] = distance[goal_index]
+
+        # К одной цели обычно идут многие танки: со второго запроса
+        # строится дерево кратчайших путей от цели, и маршрут читается из него
+        self.goal_requests[goal_index] = self.goal_requests.get(goal_index, 0) + 1
+        if goal_index in self.goal_trees or self.goal_requests[goal_index] > 1:
+            abstract = self._tree_route(start_index, goal_index, start_links)
+        else:
+            abstract = self._abstract_search(start_index, goal_index, start_links)
+        if not abstract:
+            return []
+
+        # Уточнение: переходы между кластерами - соседние клетки,
+        # остальные ребра - путь внутри кластера
+        path = [start_index]
+        for a, b in zip(abstract, abstract[1:]):
+            if self.cluster_of(a) != self.cluster_of(b):
+                path.append(b)
+            else:
+                path.extend(self._segment(a, b))
+        return [graph.position(index) for index in path]
+
+    def _abstract_search(self, start_index: int, goal_index: int,
+                         start_links: Dict[int, int]) -> List[int]:
+        """A* по абстрактному графу с временными узлами старта и цели"""
+        width = self.graph.width
+        gx, gy = goal_index % width, goal_index // width
+        goal_links = self._link(goal_index)
+        edges = self.edges
+
+        cost = {start_index: 0}
+        parent = {start_index: -1}
+        closed = set()
+        frontier = [(abs(start_index % width - gx) + abs(start_index // width - gy),
+                     0, start_index)]
+        while frontier:
+            _, negative_cost, current = heapq.heappop(frontier)
+            if current in closed:
+                continue
+            closed.add(current)
+            self.graph.expansions += 1
+            if current == goal_index:
+                break
+
+            links = list(edges.get(current, {}).items())
+            if current == start_index:
+                links.extend(start_links.items())
+            if current in goal_links:
+                links.append((goal_index, goal_links[current]))
+            for neighbor, step_cost in links:
+                new_cost = -negative_cost + step_cost
+                if neighbor not in cost or new_cost < cost[neighbor]:
+                    cost[neighbor] = new_cost
+                    parent[neighbor] = current
+                    priority = (new_cost + abs(neighbor % width - gx) +
+                                abs(neighbor // width - gy))
+                    heapq.heappush(frontier, (priority, -new_cost, neighbor))
+        else:
+            return []
+
+        abstract = []
+        current = goal_index
+        while current != -1:
+            abstract.append(current)
+            current = parent[current]
+        abstract.reverse()
+        return abstract
+
+    def _goal_tree(self, goal_index: int) -> Tuple[Dict[int, int], Dict[int, int]]:
+        """Дейкстра по абстрактному графу от цели (расстояние, следующий узел)"""
+        if goal_index in self.goal_trees:
+            return self.goal_trees[goal_index]
+
+        edges = self.edges
+        goal_links = self._link(goal_index)
+        distance = {goal_index: 0}
+        next_node = {goal_index: -1}
+        frontier = [(0, goal_index)]
+        while frontier:
+            current_distance, current = heapq.heappop(frontier)
+            if current_distance != distance[current]:
+                continue
+            self.graph.expansions += 1
+            links = list(edges.get(current, {}).items())
+            if current == goal_index:
+                links.extend(goal_links.items())
+            for neighbor, step_cost in links:
+                new_distance = current_distance + step_cost
+                if neighbor not in distance or new_distance < distance[neighbor]:
+                    distance[neighbor] = new_distance
+                    next_node[neighbor] = current
+                    heapq.heappush(frontier, (new_distance, neighbor))
+
+        if len(self.goal_trees) >= HPA_GOAL_TREES:
+            self.goal_trees.pop(next(iter(self.goal_trees)))
+        self.goal_trees[goal_index] = (distance, next_node)
+        return distance, next_node
+
+    def _tree_route(self, start_index: int, goal_index: int,
+                    start_links: Dict[int, int]) -> List[int]:
+        distance, next_node = self._goal_tree(goal_index)
+        # Старт сам может быть узлом абстрактного графа
+        candidates = dict(start_links)
+        candidates[start_index] = 0
+        best, best_cost = -1, None
+        for node, cost in candidates.items():
+            if node in distance and (best_cost is None or
+                                     cost + distance[node] < best_cost):
+                best, best_cost = node, cost + distance[node]
+        if best < 0:
+            return []
+
+        abstract = [start_index] if best != start_index else []
+        current = best
+        while current != -1:
+            abstract.append(current)
+            current = next_node[current]
+        return abstract
+
+def hierarchical_search(graph: GridGraph, start: Tuple[int, int],
+                        goal: Tuple[int, int]) -> List[Tuple[int, int]]:
+    """Поиск пути HPA* (близкий к кратчайшему) для больших карт
+
+    Короткие маршруты дешевле и точнее найти обычным A*.
+    """
+    hierarchy = graph.get_hierarchy()
+    if abs(start[0] - goal[0]) + abs(start[1] - goal[1]) <= hierarchy.cluster_size:
+        return a_star(graph, start, goal)
+    return hierarchy.find_path(start, goal)
+
+PATHFINDERS = {
+    "astar": a_star,
+    "jps": jump_point_search,
+    "hpa": hierarchical_search
+}
+
+# Поле потока: расстояния до общей цели для всех клеток карты
+class FlowField:
+    def __init__(self, graph: GridGraph):
+        self.graph = graph
+        self.width = graph.width
+        self.height = graph.height
+        self.distance = array('i', [UNREACHABLE]) * graph.size
+        # Индекс следующей клетки на пути к цели (-1 - пути нет)
+        self.next_index = array('i', [-1]) * graph.size
+        self.target: Optional[Tuple[int, int]] = None
+        self.builds = 0
+        self.repairs = 0
+
+    def invalidate(self) -> None:
+        self.target = None
+
+    def build(self, target: Tuple[int, int]) -> None:
+        """Поиск в ширину от цели по всем проходимым клеткам"""
+        size = self.graph.size
+        distance = array('i', [UNREACHABLE]) * size
+        next_index = array('i', [-1]) * size
+        self.target = target
+        self.builds += 1
+
+        if not self.graph.in_bounds(*target):
+            self.distance, self.next_index = distance, next_index
+            return
+
+        neighbors = self.graph.get_neighbor_table()
+        start = self.graph.index(*target)
+        distance[start] = 0
+        frontier = deque([start])
+
+        while frontier:
+            current = frontier.popleft()
+            next_distance = distance[current] + 1
+            for neighbor in neighbors[current]:
+                if distance[neighbor] == UNREACHABLE:
+                    distance[neighbor] = next_distance
+                    next_index[neighbor] = current
+                    frontier.append(neighbor)
+
+        self.distance, self.next_index = distance, next_index
+
+    def distance_at(self, x: int, y: int) -> int:
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return UNREACHABLE
+        return self.distance[y * self.width + x]
+
+    def next_step(self, x: int, y: int) -> Optional[Tuple[int, int]]:
+        """Следующая клетка на кратчайшем пути к цели"""
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        index = self.next_index[y * self.width + x]
+        if index < 0:
+            return None
+        return (index % self.width, index // self.width)
+
+    def repair(self, cells: Iterable[Tuple[int, int]]) -> None:
+        """Локальное исправление расстояний после смены проходимости клеток
+
+        Проходимость уже обновлена в графе. Как в D* Lite, пересчитываются
+        только клетки, чье расстояние действительно изменилось: закрытые
+        клетки отрезают свое поддерево путей, а открытые клетки и граница
+        поддерева служат источниками для досчета по Дейкстре.
+        """
+        if self.target is None:
+            return
+
+        graph = self.graph
+        width, height = self.width, self.height
+        passable = graph.passable
+        distance = self.distance
+        next_index = self.next_index
+        target_index = graph.index(*self.target)
+
+        opened = []
+        closed = []
+        for x, y in cells:
+            if not graph.in_bounds(x, y):
+                continue
+            index = y * width + x
+            if index == target_index:
+                self.build(self.target)
+                return
+            if passable[index]:
+                opened.append(index)
+            elif distance[index] != UNREACHABLE:
+                closed.append(index)
+
+        if not opened and not closed:
+            return
+        self.repairs += 1
+
+        # Закрытые клетки: сброс всех клеток, чей путь проходил через них
+        invalidated = set()
+        stack = closed
+        while stack:
+            current = stack.pop()
+            if current in invalidated:
+                continue
+            invalidated.add(current)
+            distance[current] = UNREACHABLE
+            next_index[current] = -1
+            cx, cy = current % width, current // width
+            for dx, dy in NEIGHBOR_OFFSETS:
+                nx, ny = cx + dx, cy + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    neighbor = ny * width + nx
+                    if next_index[neighbor] == current:
+                        stack.append(neighbor)
+
+        # Источники: соседи сброшенных и открытых клеток с верным расстоянием
+        frontier = []
+        for current in list(invalidated) + opened:
+            cx, cy = current % width, current // width
+            for dx, dy in NEIGHBOR_OFFSETS:
+                nx, ny = cx + dx, cy + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    neighbor = ny * width + nx
+                    if distance[neighbor] != UNREACHABLE:
+                        frontier.append((distance[neighbor], neighbor))
+        heapq.heapify(frontier)
+
+        # Досчет по Дейкстре: распространяются только улучшения
+        neighbors = graph.get_neighbor_table()
+        while frontier:
+            current_distance, current = heapq.heappop(frontier)
+            if current_distance != distance[current]:
+                continue
+            next_distance = current_distance + 1
+            for neighbor in neighbors[current]:
+                if neighbor == target_index:
+                    continue
+                old_distance = distance[neighbor]
+                if old_distance == UNREACHABLE or next_distance < old_distance:
+                    distance[neighbor] = next_distance
+                    next_index[neighbor] = current
+                    heapq.heappush(frontier, (next_distance, neighbor))
+
+# Номер версии снимка в начале общей памяти: нечетный, пока идет запись
+SNAPSHOT_VERSION = struct.Struct("<Q")
+
+# Состояние процесса-исполнителя: снимок карты и его локальный граф
+_worker_memory: Optional[shared_memory.SharedMemory] = None
+_worker_graph: Optional[GridGraph] = None
+_worker_version = -1
+
+def _worker_init(name: str, width: int, height: int) -> None:
+    global _worker_memory, _worker_graph, _worker_version
+    _worker_memory = shared_memory.SharedMemory(name=name)
+    _worker_graph = GridGraph(width, height)
+    _worker_version = -1
+
+def _worker_sync() -> GridGraph:
+    # Перечитываем снимок, только если главный процесс его обновил.
+    # Версия до и после копирования должна совпасть и быть четной
+    global _worker_version
+    buffer = _worker_memory.buf
+    offset = SNAPSHOT_VERSION.size
+    while True:
+        version = SNAPSHOT_VERSION.unpack_from(buffer)[0]
+        if version == _worker_version:
+            return _worker_graph
+        if version % 2:
+            time.sleep(0)
+            continue
+        snapshot = bytes(buffer[offset:offset + _worker_graph.size])
+        if SNAPSHOT_VERSION.unpack_from(buffer)[0] == version:
+            # Таблицы поиска исполнителя патчатся только в изменившихся
+            # клетках, как и в главном процессе
+            _worker_graph.apply_snapshot(snapshot)
+            _worker_version = version
+            return _worker_graph
+
+def _worker_find_path(algorithm: str, start: Tuple[int, int],
+                      goal: Tuple[int, int]) -> List[Tuple[int, int]]:
+    return PATHFINDERS[algorithm](_worker_sync(), start, goal)
+
+# Пул процессов для поиска пути вне главного цикла. Карта проходимости
+# лежит в общей памяти: главный процесс пишет, исполнители только читают
+class PathWorkerPool:
+    def __init__(self, graph: GridGraph, workers: int = 1):
+        self.graph = graph
+        self.version = 0
+        self.memory = shared_memory.SharedMemory(
+            create=True, size=SNAPSHOT_VERSION.size + graph.size)
+        self.publish()
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_worker_init,
+            initargs=(self.memory.name, graph.width, graph.height))
+
+    def publish(self) -> None:
+        """Выкладывание текущей проходимости графа для исполнителей"""
+        buffer = self.memory.buf
+        offset = SNAPSHOT_VERSION.size
+        SNAPSHOT_VERSION.pack_into(buffer, 0, self.version + 1)
+        buffer[offset:offset + self.graph.size] = self.graph.passable
+        self.version += 2
+        SNAPSHOT_VERSION.pack_into(buffer, 0, self.version)
+
+    def publish_cells(self, cells: Iterable[Tuple[int, int]]) -> None:
+        """Обновление снимка только в изменившихся клетках"""
+        buffer = self.memory.buf
+        offset = SNAPSHOT_VERSION.size
+        graph = self.graph
+        SNAPSHOT_VERSION.pack_into(buffer, 0, self.version + 1)
+        for x, y in cells:
+            index = graph.index(x, y)
+            buffer[offset + index] = graph.passable[index]
+        self.version += 2
+        SNAPSHOT_VERSION.pack_into(buffer, 0, self.version)
+
+    def submit(self, algorithm: str, start: Tuple[int, int],
+               goal: Tuple[int, int]) -> Future:
+        """Запрос пути; результат - Future со списком клеток"""
+        return self.executor.submit(_worker_find_path, algorithm, start, goal)
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        self.memory.close()
+        self.memory.unlink()
+
+def make_random_grid(width: int, height: int, density: float,
+                     seed: int) -> GridGraph:
+    """Случайная карта с заданной долей непроходимых клеток"""
+    rng = random.Random(seed)
+    graph = GridGraph(width, height)
+    for index in range(graph.size):
+        graph.passable[index] = 0 if rng.random() < density else 1
+    return graph
+
+def benchmark(sizes: Iterable[Tuple[int, int]] = ((20, 10), (200, 100),
+                                                  (1000, 500)),
+              density: float = 0.2, queries: int = 20,
+              seed: int = 0, algorithm: str = "astar") -> List[dict]:
+    """Замер скорости поиска (раскрытий узлов в секунду) на картах разного размера"""
+    find_path = PATHFINDERS[algorithm]
+    results = []
+    for width, height in sizes:
+        graph = make_random_grid(width, height, density, seed)
+        rng = random.Random(seed)
+
+        # Клетки в противоположных углах карты дают длинные маршруты
+        pairs = []
+        for _ in range(queries):
+            start = (rng.randrange(width // 4 + 1), rng.randrange(height // 4 + 1))
+            goal = (width - 1 - rng.randrange(width // 4 + 1),
+                    height - 1 - rng.randrange(height // 4 + 1))
+            graph.set_passable(*start, True)
+            graph.set_passable(*goal, True)
+            pairs.append((start, goal))
+
+        started = time.perf_counter()
+        graph.get_neighbor_table()
+        if algorithm == "jps":
+            graph.get_jump_table()
+        elif algorithm == "hpa":
+            graph.get_hierarchy()
+        table_time = time.perf_counter() - started
+
+        found = 0
+        search_time = 0.0
+        for start, goal in pairs:
+            started = time.perf_counter()
+            if find_path(graph, start, goal):
+                found += 1
+            search_time += time.perf_counter() - started
+
+        results.append({
+            'algorithm': algorithm,
+            'grid': f"{width}x{height}",
+            'queries': queries,
+            'found': found,
+            'expansions': graph.expansions,
+            'table_ms': table_time * 1000,
+            'query_ms': search_time * 1000 / queries,
+            'expansions_per_sec': graph.expansions / search_time if search_time else 0.0
+        })
+    return results
+
+def print_benchmark(results: List[dict]) -> None:
+    print(f"{'algorithm':>9} {'grid':>10} {'found':>7} {'expansions':>11} "
+          f"{'table ms':>9} {'query ms':>9} {'exp/sec':>11}")
+    for row in results:
+        print(f"{row['algorithm']:>9} {row['grid']:>10} "
+              f"{row['found']:>4}/{row['queries']:<2} "
+              f"{row['expansions']:>11} {row['table_ms']:>9.1f} "
+              f"{row['query_ms']:>9.2f} {row['expansions_per_sec']:>11.0f}")
+
+if __name__ == "__main__":
+    query_count = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    for name in PATHFINDERS:
+        print_benchmark(benchmark(queries=query_count, algorithm=name))
+        for open_density in (0.0, 0.05):
+            print_benchmark(benchmark(density=open_density, queries=query_count,
+                                      algorithm=name)[-1:])